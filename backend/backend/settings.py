@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 
@@ -124,12 +125,90 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Версии кэша, кэшированные представления и наборы id должны быть общими
+# для всех процессов gunicorn и воркера задач, поэтому по умолчанию — Redis.
+# Кэш в памяти процесса допустим только для разработки и тестов.
+LOCMEM_CACHE = "django.core.cache.backends.locmem.LocMemCache"
+LOCAL_RUN = DEBUG or USE_SQLITE
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            LOCMEM_CACHE if LOCAL_RUN
+            else "django.core.cache.backends.redis.RedisCache",
+        ),
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION",
+            "foodgram" if LOCAL_RUN else "redis://redis:6379/0",
+        ),
+    }
+}
+
+if CACHES["default"]["BACKEND"] == LOCMEM_CACHE and not LOCAL_RUN:
+    raise ImproperlyConfigured(
+        "Кэш в памяти процесса не виден другим процессам и воркеру задач: "
+        "задайте общий кэш в CACHE_BACKEND и CACHE_LOCATION."
+    )
+
+# Время жизни кэша id избранного, списка покупок и подписок пользователя.
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Время жизни кэша общих для всех пользователей представлений рецептов.
+RECIPE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Поиск ингредиентов по индексу в памяти воркера: больше стольких
+# совпадений без limit — поиск через базу.
+INGREDIENT_SEARCH_MAX_IDS = 1000
+INGREDIENT_INDEX_CHUNK_SIZE = 10_000
+
+# Ограничения для картинок в base64: размер после декодирования и число
+# пикселей (защита от «бомб» распаковки).
+IMAGE_UPLOAD_MAX_SIZE = 10 * 2**20
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+
+# Уменьшенные копии картинок (вписываются в размер, пропорции сохраняются)
+# создаются после загрузки фоновой задачей.
+IMAGE_VARIANTS = {
+    "recipe": {"thumbnail": (480, 360), "detail": (1280, 960)},
+    "avatar": {"small": (64, 64), "medium": (256, 256)},
+}
+IMAGE_VARIANT_FORMATS = ("webp", "jpeg")
+IMAGE_VARIANT_QUALITY = 82
+
+# Очередь фоновых задач в базе (core.jobs), её выполняет manage.py run_jobs.
+# JOBS_EAGER: выполнять задачи сразу после коммита в том же потоке (тесты).
+JOBS_EAGER = False
+JOBS_BATCH_SIZE = int(os.getenv("JOBS_BATCH_SIZE", 10))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 1))
+JOBS_MAX_ATTEMPTS = 5
+# Пауза перед повтором удваивается с каждой попыткой, секунд.
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 3600
+# Задачу, которую воркер держит дольше, считаем брошенной и отдаём другому.
+JOBS_TIMEOUT = 1800
+# Удалённые рецепты и пользователи сразу скрываются, а их строки
+# удаляются в фоне пачками по DELETION_BATCH_SIZE, каждая в своей транзакции.
+DELETION_BATCH_SIZE = 200
+
+
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "collected_static"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media" if USE_SQLITE else "/media"
 
+# Медиафайлы именуются по хэшу содержимого (core.storage), поэтому их
+# URL неизменны и отдаются nginx с Cache-Control: immutable.
+STORAGES = {
+    "default": {
+        "BACKEND": "core.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
@@ -157,6 +236,19 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Режимы подсчёта `count` для пагинируемых эндпоинтов `<basename>-<action>`:
+# exact — COUNT(*), cached — кэш по набору фильтров, estimate — оценка
+# планировщика PostgreSQL для списков без фильтров.
+PAGINATION_COUNT = {
+    "MODES": {
+        "recipes-list": "cached",
+        "users-list": "estimate",
+        "users-subscriptions": "exact",
+    },
+    "CACHE_TIMEOUT": 60,
+    "ESTIMATE_THRESHOLD": 10_000,
+}
+
 DJOSER = {
     "SERIALIZERS": {
         **dict.fromkeys(
@@ -0,0 +1,74 @@
+from django.contrib import admin
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from core.models import Job
+
+
+class SoftDeleteAdminMixin:
+    """
+    Удаление из админки только скрывает объекты функцией soft_delete,
+    а зависимые строки и файлы удаляются в фоне. Поэтому страница
+    подтверждения не обходит каскад, а просто перечисляет объекты.
+    """
+
+    soft_delete = None
+
+    def delete_model(self, request, obj):
+        self.soft_delete(self.model._default_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.soft_delete(queryset)
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {self.model._meta.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "name", "status", "attempts", "max_attempts", "run_at", "error")
+    list_filter = ("status", "name")
+    search_fields = ("name", "key")
+    readonly_fields = ("locked_at", "created_at", "last_error")
+    actions = ("retry",)
+
+    @admin.display(description="Ошибка")
+    def error(self, obj):
+        return obj.last_error.strip().rsplit("\n", 1)[-1]
+
+    @admin.action(description="Перезапустить выбранные задачи")
+    def retry(self, request, queryset):
+        retried = 0
+        for pk in queryset.filter(status=Job.FAILED).values_list(
+                "pk", flat=True):
+            try:
+                with transaction.atomic():
+                    retried += Job.objects.filter(pk=pk).update(
+                        status=Job.QUEUED, attempts=0, run_at=timezone.now())
+            except IntegrityError:
+                # Задача с тем же ключом уже ждёт в очереди.
+                continue
+        self.message_user(request, f"Перезапущено задач: {retried}")
+
+    def changelist_view(self, request, extra_context=None):
+        now = timezone.now()
+        depth = Job.objects.aggregate(
+            ready=Count("pk", filter=Q(status=Job.QUEUED, run_at__lte=now)),
+            scheduled=Count(
+                "pk", filter=Q(status=Job.QUEUED, run_at__gt=now)),
+            running=Count("pk", filter=Q(status=Job.RUNNING)),
+            failed=Count("pk", filter=Q(status=Job.FAILED)),
+            oldest=Min("run_at", filter=Q(status=Job.QUEUED, run_at__lte=now)),
+        )
+        depth["lag"] = depth["oldest"] and int(
+            (now - depth["oldest"]).total_seconds())
+        return super().changelist_view(
+            request, {**(extra_context or {}), "queue_depth": depth})
@@ -0,0 +1,39 @@
+import time
+
+from django.core.cache import cache
+
+
+VERSION_KEY = "version:{}"
+
+RECIPE_VERSION = "recipe:{}"
+RECIPES_VERSION = "recipes"
+USER_VERSION = "user:{}"
+MEMBERSHIP_VERSION = "membership:{}"
+CATALOGUE_VERSION = "catalogue"
+TAGS_VERSION = "tags"
+INGREDIENTS_VERSION = "ingredients"
+
+
+def get_versions(*names):
+    """
+    Текущие версии именованных наборов данных.
+    Версия — момент последнего изменения в наносекундах.
+    """
+    keys = {VERSION_KEY.format(name): name for name in names}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    """Отмечает изменение наборов данных, сбрасывая зависящие от них кэши."""
+    now = time.time_ns()
+    cache.set_many(
+        {VERSION_KEY.format(name): now for name in names}, timeout=None)
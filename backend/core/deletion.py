@@ -0,0 +1,128 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import RECIPES_VERSION, USER_VERSION, bump_version
+from core.jobs import enqueue, job
+from core.pagination import invalidate_cached_counts
+
+
+def soft_delete_recipes(recipes):
+    """
+    Скрывает рецепты одним UPDATE и ставит их удаление в очередь задач.
+    Ответ не ждёт ни каскада по избранному и спискам покупок, ни файлов;
+    из сумм списков покупок рецепты вычитаются сразу.
+    """
+    recipe_model = apps.get_model("recipes", "Recipe")
+    with transaction.atomic():
+        pks = list(recipes.filter(deleted_at__isnull=True).values_list(
+            "pk", flat=True))
+        subtract_from_cart_totals(pks)
+        deleted = recipe_model.objects.filter(pk__in=pks).update(
+            deleted_at=timezone.now())
+    if deleted:
+        invalidate_cached_counts(recipe_model)
+        bump_version(RECIPES_VERSION)
+        schedule_purge()
+    return deleted
+
+
+def soft_delete_users(users):
+    """
+    Деактивирует пользователей, отзывает их токены и скрывает их рецепты;
+    строки и файлы удаляет фоновая очистка.
+    """
+    user_model = apps.get_model("users", "User")
+    recipe_model = apps.get_model("recipes", "Recipe")
+    now = timezone.now()
+    with transaction.atomic():
+        pks = list(
+            users.filter(deleted_at__isnull=True).values_list("pk", flat=True))
+        if not pks:
+            return 0
+        user_model._base_manager.filter(pk__in=pks).update(
+            deleted_at=now, is_active=False)
+        apps.get_model("authtoken", "Token").objects.filter(
+            user_id__in=pks).delete()
+        recipes = recipe_model.objects.filter(author_id__in=pks)
+        subtract_from_cart_totals(recipes.values_list("pk", flat=True))
+        recipes.update(deleted_at=now)
+    invalidate_cached_counts(user_model)
+    invalidate_cached_counts(recipe_model)
+    bump_version(*(USER_VERSION.format(pk) for pk in pks), RECIPES_VERSION)
+    schedule_purge()
+    return len(pks)
+
+
+def subtract_from_cart_totals(recipe_ids):
+    """
+    Вычитает рецепты из сумм списков покупок до скрытия: строки корзин
+    удалит фоновая очистка, и их сигналы скрытый рецепт уже не вычтут.
+    """
+    users = defaultdict(list)
+    for user_id, recipe_id in apps.get_model(
+        "recipes", "ShoppingCart"
+    ).objects.filter(recipe_id__in=recipe_ids).values_list(
+            "user_id", "recipe_id"):
+        users[recipe_id].append(user_id)
+    totals = apps.get_model("recipes", "ShoppingCartTotal").objects
+    for recipe_id, user_ids in users.items():
+        totals.add_recipe(user_ids, recipe_id, sign=-1)
+
+
+def delete_in_chunks(queryset, batch_size=None):
+    """
+    Удаляет строки queryset пачками, каждую в своей транзакции.
+    Строки, заблокированные параллельной очисткой, пропускаются.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    manager = queryset.model._base_manager
+    total = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                queryset.select_for_update(skip_locked=True)
+                .order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                return total
+            manager.filter(pk__in=pks).delete()
+        total += len(pks)
+
+
+def schedule_purge():
+    enqueue(purge_deleted, key=purge_deleted.job_name)
+
+
+@job(every=timedelta(hours=1))
+def purge_deleted():
+    """
+    Удаляет скрытые рецепты и пользователей: сначала зависимые строки
+    пачками, затем сами объекты. Файлы освобождаются обработчиками
+    post_delete после коммита каждой пачки. Раз в час запускается
+    и сама, подбирая то, что не удалось удалить раньше.
+    """
+    recipe_model = apps.get_model("recipes", "Recipe")
+    user_model = apps.get_model("users", "User")
+    cart_model = apps.get_model("recipes", "ShoppingCart")
+    favorite_model = apps.get_model("recipes", "Favorite")
+
+    recipes = recipe_model.all_objects.filter(deleted_at__isnull=False)
+    delete_in_chunks(cart_model.objects.filter(recipe__in=recipes))
+    delete_in_chunks(favorite_model.objects.filter(recipe__in=recipes))
+    delete_in_chunks(recipes)
+
+    users = user_model._base_manager.filter(deleted_at__isnull=False)
+    delete_in_chunks(
+        apps.get_model("recipes", "ShoppingCartTotal").objects.filter(
+            user__in=users))
+    delete_in_chunks(cart_model.objects.filter(user__in=users))
+    delete_in_chunks(favorite_model.objects.filter(user__in=users))
+    subscriptions = apps.get_model("users", "Subscription").objects
+    delete_in_chunks(subscriptions.filter(user__in=users))
+    delete_in_chunks(subscriptions.filter(author__in=users))
+    delete_in_chunks(users, batch_size=1)
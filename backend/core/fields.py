@@ -1,30 +1,185 @@
+import base64
+import binascii
+from contextlib import contextmanager
+import os
 import re
+from tempfile import SpooledTemporaryFile
 
+from PIL import Image
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import MinValueValidator
 from django.db import models
 from drf_extra_fields.fields import Base64ImageField
+import filetype
+from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from core.images import variant_urls
+
+
+class DeferredImage(str):
+    """Base64-картинка, прошедшая только проверку заголовка."""
 
 
 class CustomBase64ImageField(Base64ImageField):
+    """
+    Картинка в base64 из data URI или файлом из multipart-формы
+    (см. core.parsers.MultiPartJSONParser). Тело base64 декодируется кусками в
+    SpooledTemporaryFile: алфавит и сигнатура формата проверяются по ходу,
+    размер — до декодирования, число пикселей — по заголовку картинки
+    до её полной загрузки Pillow.
+    """
+
     default_error_messages = {
         "required": "Обязательно поле.",
         "invalid_image": "Неверный формат изображения.",
         "blank": "Поле для картинки не может быть пустым.",
+        "too_large": "Размер изображения не должен превышать {max_mb} МБ.",
+        "too_many_pixels": "Слишком большое разрешение изображения.",
     }
+    data_uri_header = re.compile(r"^data:image/[A-Za-z0-9]+;base64,")
+    # Переносы строк и пробелы допустимы в base64 (RFC 2045) и удаляются
+    # до декодирования.
+    whitespace = re.compile(r"[ \t\n\r\f\v]+")
+    # Кратно 4, чтобы каждый кусок base64 декодировался отдельно.
+    chunk_size = 64 * 1024
+    signature_size = 261
+
+    def __init__(self, *args, defer_decoding=False, **kwargs):
+        """
+        defer_decoding=True: поле проверяет только заголовок data URI
+        и возвращает DeferredImage; декодирует сериализатор через decode(),
+        когда остальные поля уже прошли валидацию.
+        """
+        self.defer_decoding = defer_decoding
+        super().__init__(*args, **kwargs)
 
     def to_internal_value(self, data):
         if data == "":
             raise ValidationError(self.error_messages.get("blank"))
+        if isinstance(data, UploadedFile):
+            return data if self.defer_decoding else self.decode(data)
+        if not isinstance(data, str) or not self.data_uri_header.match(data):
+            raise ValidationError(self.error_messages.get("invalid_image"))
+        if self.defer_decoding:
+            return DeferredImage(data)
+        return self.decode(data)
 
-        data_uri = r"^data:image/[A-Za-z0-9]+;base64,[A-Za-z0-9+/]+={0,2}$"
+    def decode(self, data):
+        """Проверяет картинку: data URI или файл из multipart-формы."""
+        if isinstance(data, UploadedFile):
+            return self._check_upload(data)
+        start = self.data_uri_header.match(data).end()
+        if self.whitespace.search(data, start):
+            data, start = self.whitespace.sub("", data[start:]), 0
+        max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+        if (len(data) - start) // 4 * 3 > max_size + 2:
+            raise ValidationError(self.error_messages["too_large"].format(
+                max_mb=max_size // 2**20))
+        spool = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        try:
+            extension = self._decode_to(spool, data, start)
+            self._check_image(spool)
+        except ValidationError:
+            spool.close()
+            raise
+        except Exception:
+            spool.close()
+            raise ValidationError(self.error_messages.get("invalid_image"))
+        size = spool.seek(0, os.SEEK_END)
+        spool.seek(0)
+        mime_type = "jpeg" if extension == "jpg" else extension
+        return UploadedFile(
+            file=spool,
+            name=f"{self.get_file_name(None)}.{extension}",
+            content_type=f"image/{mime_type}",
+            size=size,
+        )
 
-        if not re.match(data_uri, data):
+    def _check_upload(self, upload):
+        max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+        if upload.size > max_size:
+            raise ValidationError(self.error_messages["too_large"].format(
+                max_mb=max_size // 2**20))
+        try:
+            upload.seek(0, os.SEEK_END)
+            extension = self._guess_extension(upload)
+            self._check_image(upload)
+        except ValidationError:
+            raise
+        except Exception:
+            raise ValidationError(self.error_messages.get("invalid_image"))
+        upload.seek(0)
+        upload.name = f"{self.get_file_name(None)}.{extension}"
+        return upload
+
+    def _decode_to(self, spool, data, start):
+        """Пишет декодированное тело в spool, возвращает расширение."""
+        if (len(data) - start) % 4:
+            raise ValidationError(self.error_messages.get("invalid_image"))
+        extension = None
+        pixels_checked = False
+        for offset in range(start, len(data), self.chunk_size):
+            chunk = data[offset:offset + self.chunk_size]
+            is_last = offset + self.chunk_size >= len(data)
+            if not is_last and chunk.endswith("="):
+                raise ValidationError(
+                    self.error_messages.get("invalid_image"))
+            try:
+                spool.write(base64.b64decode(chunk, validate=True))
+            except (binascii.Error, ValueError):
+                raise ValidationError(
+                    self.error_messages.get("invalid_image"))
+            if extension is None and (
+                    spool.tell() >= self.signature_size or is_last):
+                extension = self._guess_extension(spool)
+            if extension is not None and not pixels_checked:
+                pixels_checked = self._check_pixels(spool)
+        if extension is None:
+            raise ValidationError(self.error_messages.get("invalid_image"))
+        return extension
+
+    def _guess_extension(self, spool):
+        spool.seek(0)
+        head = spool.read(self.signature_size)
+        spool.seek(0, os.SEEK_END)
+        extension = filetype.guess_extension(head)
+        if extension == "jpeg":
+            extension = "jpg"
+        if extension not in self.ALLOWED_TYPES:
             raise ValidationError(self.error_messages.get("invalid_image"))
+        return extension
+
+    def _check_pixels(self, spool):
+        """
+        Проверяет разрешение по уже декодированному началу файла.
+        False — заголовок картинки ещё не дописан.
+        """
+        position = spool.tell()
+        spool.seek(0)
         try:
-            return super().to_internal_value(data)
+            with Image.open(spool) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            raise ValidationError(self.error_messages.get("too_many_pixels"))
         except Exception:
+            return False
+        finally:
+            spool.seek(position)
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            raise ValidationError(self.error_messages.get("too_many_pixels"))
+        return True
+
+    def _check_image(self, spool):
+        if not self._check_pixels(spool):
             raise ValidationError(self.error_messages.get("invalid_image"))
+        spool.seek(0)
+        with Image.open(spool) as image:
+            image.verify()
 
 
 class FromOneSmallIntegerField(models.PositiveIntegerField):
@@ -33,3 +188,85 @@ class FromOneSmallIntegerField(models.PositiveIntegerField):
         validators.append(MinValueValidator(1))
         kwargs["validators"] = validators
         super().__init__(*args, **kwargs)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, которому можно заранее загрузить объекты
+    для всего списка значений одним запросом IN (см. preloaded).
+    Ошибки те же, что у PrimaryKeyRelatedField.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._preloaded = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    @contextmanager
+    def preloaded(self, values):
+        pks = set()
+        for value in values:
+            pk = self._to_pk(value)
+            if pk is not None:
+                pks.add(pk)
+        self._preloaded = self.get_queryset().in_bulk(pks)
+        try:
+            yield
+        finally:
+            self._preloaded = None
+
+    def _to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            return None
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+
+    def to_internal_value(self, data):
+        if self._preloaded is None:
+            return super().to_internal_value(data)
+        pk = self._to_pk(data)
+        if pk is None:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return self._preloaded[pk]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            return super().to_internal_value(data)
+        with self.child_relation.preloaded(data):
+            return super().to_internal_value(data)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Адреса уменьшенных копий картинки: {размер: {формат: url}}.
+    Пока копии не готовы, адреса ведут на оригинал.
+    """
+
+    def __init__(self, image_field, kind, **kwargs):
+        self.image_field = image_field
+        self.kind = kind
+        kwargs.update(source="*", read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return variant_urls(
+            instance, self.image_field, self.kind,
+            request=self.context.get("request"),
+        )
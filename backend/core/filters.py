@@ -1,8 +1,12 @@
-from django.db.models import Case, IntegerField, Q, When
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, When
 import django_filters
 from logging_setup import logger_setup
 
-from recipes.models import Ingredient, Recipe
+from core.cache import TAGS_VERSION, get_version
+from core.search import get_ingredient_index
+from recipes.models import Ingredient, Recipe, Tag
 
 
 logger = logger_setup()
@@ -10,29 +14,70 @@ logger = logger_setup()
 
 class IngredientFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(method="filter_name")
+    limit = django_filters.NumberFilter(method="filter_limit", min_value=1)
 
     class Meta:
         model = Ingredient
         fields = ("name",)
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        limit = self.form.cleaned_data.get("limit")
+        return queryset[:int(limit)] if limit else queryset
+
+    def filter_limit(self, queryset, name, value):
+        # Срез применяется в filter_queryset после всех фильтров.
+        return queryset
+
     def filter_name(self, queryset, name, value):
-        return (
+        """
+        Id совпадений ищутся в индексе воркера, база только сортирует
+        найденное. Слишком широкие запросы без limit идут через ORM.
+        """
+        limit = self.form.cleaned_data.get("limit")
+        max_ids = settings.INGREDIENT_SEARCH_MAX_IDS
+        ids = get_ingredient_index().search(
+            value, limit=int(limit) if limit else max_ids + 1)
+        if len(ids) > max_ids:
+            return self.filter_name_orm(queryset, value)
+        return self.order_by_priority(queryset.filter(pk__in=ids), value)
+
+    @classmethod
+    def filter_name_orm(cls, queryset, value):
+        return cls.order_by_priority(
             queryset.filter(Q(name__istartswith=value)
-                            | Q(name__icontains=value))
-            .annotate(
-                priority=Case(
-                    When(name__istartswith=value, then=0),
-                    default=1,
-                    output_field=IntegerField(),
-                )
-            )
-            .order_by("priority", "name")
+                            | Q(name__icontains=value)),
+            value,
         )
 
+    @staticmethod
+    def order_by_priority(queryset, value):
+        return queryset.annotate(
+            priority=Case(
+                When(name__istartswith=value, then=0),
+                default=1,
+                output_field=IntegerField(),
+            )
+        ).order_by("priority", "name", "id")
+
+
+def get_tag_ids_by_slug():
+    """Id тегов по слагам из кэша; кэш сбрасывается вместе с версией тегов."""
+    key = f"tag-ids-by-slug:{get_version(TAGS_VERSION)}"
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list("slug", "id"))
+        cache.set(key, tag_ids, None)
+    return tag_ids
+
+
+def tag_slug_choices():
+    return [(slug, slug) for slug in sorted(get_tag_ids_by_slug())]
+
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.filters.AllValuesMultipleFilter(
-        field_name="tags__slug")
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_slug_choices, method="filter_tags")
 
     class Meta:
         model = Recipe
@@ -40,3 +85,19 @@ class RecipeFilter(django_filters.FilterSet):
             "author",
             "tags",
         )
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Любой из тегов: EXISTS по промежуточной таблице не размножает
+        строки рецептов и не требует DISTINCT.
+        """
+        tag_ids = get_tag_ids_by_slug()
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe_id=OuterRef("pk"),
+                    tag_id__in=[
+                        tag_ids[slug] for slug in value if slug in tag_ids],
+                )
+            )
+        )
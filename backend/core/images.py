@@ -0,0 +1,158 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from core.cache import bump_version
+from core.jobs import enqueue, job
+
+
+def variant_name(source, variant, file_format):
+    """Имя копии для хранилища: a.png → a_thumbnail.webp."""
+    root, _ = os.path.splitext(source)
+    extension = "jpg" if file_format == "jpeg" else file_format
+    return f"{root}_{variant}.{extension}"
+
+
+def iter_variant_names(variants):
+    for variant, files in variants.items():
+        if variant != "source":
+            yield from files.values()
+
+
+def delete_variants(storage, variants):
+    for name in iter_variant_names(variants or {}):
+        storage.delete(name)
+
+
+def release_replaced_image(instance, field_name, update_fields=None):
+    """
+    Для pre_save: если картинку заменили или убрали, после коммита
+    освобождает старый файл и его варианты, а варианты экземпляра
+    сбрасывает — их построят заново для новой картинки.
+    """
+    if instance._state.adding or (
+        update_fields is not None and field_name not in update_fields
+    ):
+        return
+    old = type(instance)._base_manager.filter(pk=instance.pk).values_list(
+        field_name, "image_variants").first()
+    image = getattr(instance, field_name)
+    if old is None or not old[0] or old[0] == image.name:
+        return
+    old_name, old_variants = old
+    instance.image_variants = {}
+    storage = image.storage
+
+    def release():
+        storage.delete(old_name)
+        delete_variants(storage, old_variants)
+
+    transaction.on_commit(release)
+
+
+def variants_ready(instance, field_name):
+    image = getattr(instance, field_name)
+    variants = instance.image_variants or {}
+    return bool(image) and variants.get("source") == image.name
+
+
+def schedule_variants(instance, field_name, kind, versions=()):
+    """
+    Ставит генерацию вариантов картинки в очередь задач, если у оригинала
+    их ещё нет. После генерации поднимаются версии versions.
+    """
+    if getattr(instance, field_name) and not variants_ready(
+            instance, field_name):
+        enqueue(
+            generate_variants,
+            args=(
+                instance._meta.label,
+                instance.pk,
+                field_name,
+                kind,
+                list(versions),
+            ),
+            key=f"variants:{instance._meta.label}:{instance.pk}",
+        )
+
+
+def _render(image, size, file_format):
+    resized = image.copy()
+    resized.thumbnail(size, Image.LANCZOS)
+    if file_format == "jpeg" and resized.mode != "RGB":
+        background = Image.new("RGB", resized.size, "white")
+        resized = resized.convert("RGBA")
+        background.paste(resized, mask=resized.getchannel("A"))
+        resized = background
+    elif resized.mode not in ("RGB", "RGBA"):
+        resized = resized.convert("RGBA")
+    buffer = io.BytesIO()
+    resized.save(
+        buffer,
+        format=file_format.upper(),
+        quality=settings.IMAGE_VARIANT_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+@job(max_attempts=3)
+def generate_variants(model_label, pk, field_name, kind, versions=()):
+    """
+    Создаёт уменьшенные копии картинки в форматах IMAGE_VARIANT_FORMATS
+    и записывает их имена в image_variants, если оригинал не сменился.
+    """
+    model = apps.get_model(model_label)
+    instance = model._base_manager.filter(pk=pk).first()
+    if instance is None or variants_ready(instance, field_name):
+        return
+    image = getattr(instance, field_name)
+    if not image:
+        return
+    storage = image.storage
+    source = image.name
+    with image.open("rb") as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    variants = {"source": source}
+    for variant, size in settings.IMAGE_VARIANTS[kind].items():
+        for file_format in settings.IMAGE_VARIANT_FORMATS:
+            variants.setdefault(variant, {})[file_format] = storage.save(
+                variant_name(source, variant, file_format),
+                ContentFile(_render(original, size, file_format)),
+            )
+    updated = model._base_manager.filter(
+        pk=pk, **{field_name: source}).update(image_variants=variants)
+    if not updated:
+        delete_variants(storage, variants)
+        return
+    # Варианты прежней картинки освобождает release_replaced_image.
+    if versions:
+        bump_version(*versions)
+
+
+def variant_urls(instance, field_name, kind, request=None):
+    """
+    Адреса вариантов картинки по размерам и форматам; пока варианты
+    не готовы, каждый адрес указывает на оригинал.
+    """
+    image = getattr(instance, field_name)
+    if not image:
+        return None
+    variants = (
+        instance.image_variants if variants_ready(instance, field_name)
+        else {}
+    )
+    urls = {}
+    for variant in settings.IMAGE_VARIANTS[kind]:
+        files = variants.get(variant, {})
+        urls[variant] = {}
+        for file_format in settings.IMAGE_VARIANT_FORMATS:
+            url = image.storage.url(files.get(file_format, image.name))
+            urls[variant][file_format] = (
+                request.build_absolute_uri(url) if request else url)
+    return urls
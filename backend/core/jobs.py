@@ -0,0 +1,157 @@
+from datetime import timedelta
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from logging_setup import logger_setup
+
+from core.models import Job
+
+
+logger = logger_setup()
+
+PERIODIC = {}
+
+
+def job(func=None, *, max_attempts=None, every=None):
+    """
+    Делает функцию фоновой задачей: func.delay(*args, **kwargs) ставит её
+    в очередь. Аргументы должны сериализоваться в JSON. С every задача
+    периодическая: воркер держит в очереди её следующий запуск.
+    """
+    def decorate(func):
+        func.job_name = f"{func.__module__}.{func.__qualname__}"
+        func.max_attempts = max_attempts
+        func.delay = lambda *args, **kwargs: enqueue(func, args, kwargs)
+        if every is not None:
+            PERIODIC[func.job_name] = (func, every)
+        return func
+
+    return decorate(func) if func is not None else decorate
+
+
+def enqueue(func, args=(), kwargs=None, key=None, run_at=None):
+    """
+    Ставит задачу в очередь в текущей транзакции: воркер увидит её
+    только после коммита. Если задача с тем же ключом уже ждёт в очереди,
+    новая не создаётся, а ждущая при необходимости запускается раньше.
+    С JOBS_EAGER задача выполняется сразу после коммита в этом потоке.
+    """
+    kwargs = kwargs or {}
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: _call(func, args, kwargs))
+        return
+    run_at = run_at or timezone.now()
+    Job.objects.bulk_create(
+        [Job(
+            name=func.job_name,
+            args=list(args),
+            kwargs=kwargs,
+            key=key,
+            max_attempts=func.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+            run_at=run_at,
+        )],
+        ignore_conflicts=key is not None,
+    )
+    if key is not None:
+        Job.objects.filter(
+            key=key, status=Job.QUEUED, run_at__gt=run_at
+        ).update(run_at=run_at)
+
+
+def _call(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Фоновая задача %s завершилась ошибкой", func)
+
+
+def schedule_periodic():
+    """Ставит в очередь периодические задачи, которых там нет."""
+    active = set(
+        Job.objects.filter(
+            key__in=PERIODIC, status__in=(Job.QUEUED, Job.RUNNING)
+        ).values_list("key", flat=True)
+    )
+    for name, (func, _) in PERIODIC.items():
+        if name not in active:
+            enqueue(func, key=name)
+
+
+def claim(limit):
+    """
+    Забирает до limit готовых задач. На PostgreSQL строки выбираются
+    через SELECT ... FOR UPDATE SKIP LOCKED, и воркеры не ждут друг друга;
+    там, где SKIP LOCKED нет (SQLite), задачу получает тот, чей условный
+    UPDATE её изменил.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING,
+            locked_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT))
+    ).order_by("run_at", "id")
+    take = {"status": Job.RUNNING, "locked_at": now,
+            "attempts": F("attempts") + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(
+                due.select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:limit]
+            )
+            Job.objects.filter(pk__in=pks).update(**take)
+    else:
+        pks = [
+            pk for pk, status, locked_at in due.values_list(
+                "pk", "status", "locked_at")[:limit]
+            if Job.objects.filter(
+                pk=pk, status=status, locked_at=locked_at).update(**take)
+        ]
+    return list(Job.objects.filter(pk__in=pks).order_by("run_at", "id"))
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(
+        settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_BACKOFF_MAX,
+    ))
+
+
+def run(job):
+    """
+    Выполняет взятую задачу. Успешная удаляется, упавшая возвращается
+    в очередь с экспоненциальной задержкой, а после max_attempts
+    попыток остаётся с состоянием «Ошибка».
+    """
+    try:
+        func = import_string(job.name)
+        func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception("Фоновая задача %s завершилась ошибкой", job)
+        _fail(job, traceback.format_exc())
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    if job.name in PERIODIC and job.key == job.name:
+        func, every = PERIODIC[job.name]
+        enqueue(func, key=job.name, run_at=timezone.now() + every)
+    return True
+
+
+def _fail(job, error):
+    rows = Job.objects.filter(pk=job.pk)
+    if job.attempts >= job.max_attempts:
+        rows.update(status=Job.FAILED, last_error=error)
+        return
+    try:
+        with transaction.atomic():
+            rows.update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + backoff(job.attempts),
+                last_error=error,
+            )
+    except IntegrityError:
+        # Пока задача выполнялась, в очередь встала такая же.
+        rows.delete()
@@ -0,0 +1,61 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import claim, run, schedule_periodic
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер очереди фоновых задач: забирает готовые задачи пачками "
+        "и выполняет их, а когда очередь пуста — ждёт и опрашивает снова. "
+        "По SIGTERM или SIGINT дорабатывает взятые задачи и выходит."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.JOBS_BATCH_SIZE,
+            help="Сколько задач забирать за раз",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help="Пауза при пустой очереди, секунд",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Выполнить готовые задачи и выйти",
+        )
+
+    def handle(self, *args, **options):
+        if isinstance(caches["default"], LocMemCache):
+            self.stderr.write(
+                "Кэш в памяти процесса: версии, поднятые задачами, "
+                "веб-процесс не увидит. Задайте общий кэш в CACHE_BACKEND."
+            )
+        self.stopping = False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.stop)
+        done = failed = 0
+        while not self.stopping:
+            close_old_connections()
+            schedule_periodic()
+            jobs = claim(options["batch_size"])
+            for job in jobs:
+                if run(job):
+                    done += 1
+                else:
+                    failed += 1
+            if not jobs:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        self.stdout.write(f"Выполнено задач: {done}, с ошибкой: {failed}")
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,108 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.cache import (
+    RECIPE_VERSION,
+    RECIPES_VERSION,
+    USER_VERSION,
+    bump_version,
+)
+from core.storage import is_sharded
+
+
+FIELDS = (
+    ("recipes.Recipe", "image", RECIPE_VERSION),
+    ("users.User", "avatar", USER_VERSION),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит картинки из плоских каталогов в шардированную раскладку "
+        "и обновляет пути в базе пачками. Перенесённые файлы пропускаются, "
+        "поэтому прерванный перенос можно просто запустить снова."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Сколько строк читать за раз",
+        )
+        parser.add_argument(
+            "--after-pk", type=int, default=0,
+            help="Начать со строк с pk больше этого",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Пауза между пачками, секунд",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только посчитать файлы к переносу",
+        )
+
+    def handle(self, *args, **options):
+        for label, field_name, version in FIELDS:
+            moved, missing, pending = self.shard_field(
+                apps.get_model(label), field_name, version, options)
+            self.stdout.write(
+                f"{label}.{field_name}: в плоской раскладке {pending}, "
+                f"перенесено {moved}, без файла {missing}"
+            )
+
+    def shard_field(self, model, field_name, version, options):
+        moved = missing = pending = 0
+        last_pk = options["after_pk"]
+        rows = model._base_manager.exclude(
+            **{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+        while True:
+            batch = list(
+                rows.filter(pk__gt=last_pk).order_by("pk").values_list(
+                    "pk", field_name, "image_variants"
+                )[:options["batch_size"]]
+            )
+            if not batch:
+                break
+            for pk, name, variants in batch:
+                if is_sharded(name):
+                    continue
+                pending += 1
+                if options["dry_run"]:
+                    continue
+                result = self.move(model, field_name, pk, name, variants)
+                if result:
+                    bump_version(version.format(pk), RECIPES_VERSION)
+                moved += result is True
+                missing += result is None
+            last_pk = batch[-1][0]
+            self.stdout.write(f"{model._meta.label}: pk до {last_pk}")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        return moved, missing, pending
+
+    def move(self, model, field_name, pk, name, variants):
+        """
+        Копирует файл под новым именем и переключает на него строку,
+        если она всё ещё ссылается на старое имя. Старый файл удаляется
+        только после успешного обновления.
+        """
+        field = model._meta.get_field(field_name)
+        storage = field.storage
+        try:
+            with storage.open(name, "rb") as file:
+                new_name = storage.save(
+                    field.upload_to(None, name.rsplit("/", 1)[-1]), file)
+        except FileNotFoundError:
+            self.stderr.write(f"{model._meta.label} {pk}: нет файла {name}")
+            return None
+        if variants and variants.get("source") == name:
+            variants = dict(variants, source=new_name)
+        with transaction.atomic():
+            updated = model._base_manager.filter(
+                pk=pk, **{field_name: name}
+            ).update(**{field_name: new_name, "image_variants": variants})
+        storage.delete(name if updated else new_name)
+        return bool(updated)
@@ -0,0 +1,168 @@
+import heapq
+import os
+import posixpath
+import shutil
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.fields.json import KT
+from django.db.models.functions import Collate
+
+from core.models import MediaBlob
+
+
+FIELDS = (
+    ("recipes.Recipe", "image", "recipe"),
+    ("users.User", "avatar", "avatar"),
+)
+
+
+def walk(root, directory):
+    """
+    Файлы каталога в порядке сравнения строк их путей. В памяти
+    одновременно только списки каталогов текущей ветки дерева.
+    """
+    try:
+        entries = list(os.scandir(os.path.join(root, directory)))
+    except FileNotFoundError:
+        return
+    # «a/» сортируется так же, как все пути «a/…», поэтому обход в глубину
+    # по такому ключу выдаёт пути уже отсортированными.
+    entries.sort(key=lambda entry: entry.name + (
+        "/" if entry.is_dir(follow_symlinks=False) else ""))
+    for entry in entries:
+        name = posixpath.join(directory, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            yield name, entry.stat(follow_symlinks=False)
+
+
+def sorted_values(queryset, expression):
+    """Непустые значения, отсортированные побайтно на стороне базы."""
+    collation = "C" if connection.vendor == "postgresql" else "BINARY"
+    return (
+        queryset.annotate(reference=expression)
+        .exclude(reference__isnull=True)
+        .exclude(reference="")
+        .order_by(Collate("reference", collation))
+        .values_list("reference", flat=True)
+        .iterator(chunk_size=2000)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет или убирает в карантин файлы медиа, на которые не ссылается "
+        "ни одна картинка или её вариант. Дерево файлов и ссылки из базы "
+        "сливаются в отсортированном порядке, так что память не растёт "
+        "с числом файлов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours", type=float, default=24,
+            help="Не трогать файлы моложе этого, часов",
+        )
+        parser.add_argument(
+            "--quarantine",
+            help="Переносить сирот в этот каталог вместо удаления",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Сколько файлов проверять между паузами",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Пауза между пачками, секунд",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только перечислить сирот",
+        )
+
+    def handle(self, *args, **options):
+        self.root = os.path.abspath(settings.MEDIA_ROOT)
+        self.quarantine = options["quarantine"] and os.path.abspath(
+            options["quarantine"])
+        self.deadline = time.time() - options["grace_hours"] * 3600
+        scanned = orphans = size = 0
+        references = self.references()
+        reference = next(references, None)
+        for name, stat in self.files():
+            scanned += 1
+            if options["sleep"] and not scanned % options["batch_size"]:
+                time.sleep(options["sleep"])
+            while reference is not None and reference < name:
+                reference = next(references, None)
+            if reference == name or stat.st_mtime > self.deadline:
+                continue
+            if options["dry_run"] or self.sweep(name):
+                orphans += 1
+                size += stat.st_size
+                self.stdout.write(name)
+        action = (
+            "найдено" if options["dry_run"]
+            else "в карантине" if self.quarantine
+            else "удалено"
+        )
+        self.stdout.write(
+            f"Проверено файлов: {scanned}, {action} сирот: {orphans} "
+            f"({size / 2**20:.1f} МБ)"
+        )
+
+    def files(self):
+        directories = sorted({
+            apps.get_model(label)._meta.get_field(
+                field_name).upload_to.directory
+            for label, field_name, _ in FIELDS
+        })
+        for directory in directories:
+            for name, stat in walk(self.root, directory):
+                if not self.in_quarantine(name):
+                    yield name, stat
+
+    def references(self):
+        """Имена картинок и их вариантов в порядке сравнения строк."""
+        streams = []
+        for label, field_name, kind in FIELDS:
+            queryset = apps.get_model(label)._base_manager.all()
+            streams.append(sorted_values(queryset, F(field_name)))
+            for variant in settings.IMAGE_VARIANTS[kind]:
+                for file_format in settings.IMAGE_VARIANT_FORMATS:
+                    streams.append(sorted_values(
+                        queryset,
+                        KT(f"image_variants__{variant}__{file_format}"),
+                    ))
+        return heapq.merge(*streams)
+
+    def in_quarantine(self, name):
+        return bool(self.quarantine) and os.path.join(
+            self.root, name).startswith(self.quarantine + os.sep)
+
+    def sweep(self, name):
+        """
+        Убирает сироту под блокировкой её MediaBlob: параллельное
+        сохранение того же содержимого ждёт блокировку и либо обновит
+        время файла раньше, либо запишет его заново после.
+        """
+        path = os.path.join(self.root, name)
+        with transaction.atomic():
+            MediaBlob.objects.filter(name=name).delete()
+            try:
+                if os.stat(path).st_mtime > self.deadline:
+                    transaction.set_rollback(True)
+                    return False
+                if self.quarantine:
+                    target = os.path.join(self.quarantine, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                return False
+        return True
@@ -1,4 +1,19 @@
+from django.apps import apps
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import RowNumber
 
 
 class UserManager(BaseUserManager):
@@ -24,3 +39,133 @@ class UserManager(BaseUserManager):
             raise ValueError("Superuser must have is_superuser=True.")
 
         return self.create_user(email, password, **extra_fields)
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Флаги «в избранном» и «в списке покупок» для пользователя."""
+        if not user.is_authenticated:
+            return self.annotate(
+                favorited=Value(False, output_field=BooleanField()),
+                in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        flag_models = (
+            ("favorited", "Favorite"),
+            ("in_shopping_cart", "ShoppingCart"),
+        )
+        return self.annotate(**{
+            annotation: Exists(
+                apps.get_model("recipes", model_name).objects.filter(
+                    user=user, recipe=OuterRef("pk"))
+            )
+            for annotation, model_name in flag_models
+        })
+
+    def with_read_plan(self):
+        """Загрузка автора, тегов и ингредиентов для чтения рецептов."""
+        return self.select_related("author").prefetch_related(
+            *self.read_prefetches())
+
+    @staticmethod
+    def read_prefetches():
+        tag_model = apps.get_model("recipes", "Tag")
+        recipe_ingredient_model = apps.get_model(
+            "recipes", "RecipeIngredient")
+        return (
+            Prefetch(
+                "tags",
+                queryset=tag_model.objects.only("id", "name", "slug"),
+            ),
+            Prefetch(
+                "recipe_ingredients",
+                queryset=recipe_ingredient_model.objects.select_related(
+                    "ingredient"
+                ).only(
+                    "id",
+                    "recipe_id",
+                    "amount",
+                    "ingredient__id",
+                    "ingredient__name",
+                    "ingredient__measurement_unit",
+                ),
+            ),
+        )
+
+    def latest_per_author(self, author_ids, limit=None):
+        """
+        Последние рецепты авторов одним запросом:
+        не больше limit на автора, нумерация ROW_NUMBER() по author_id.
+        """
+        recipes = self.filter(author_id__in=author_ids).order_by(
+            "author_id", "-pub_date", "-id")
+        if limit is None:
+            return recipes
+        return recipes.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=(F("pub_date").desc(), F("id").desc()),
+            )
+        ).filter(row_number__lte=limit)
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """
+    Рецепты без удалённых: удалённый рецепт скрыт сразу, а его строки
+    и файлы удаляет фоновая очистка (core.deletion).
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class ShoppingCartTotalQuerySet(models.QuerySet):
+
+    def apply_deltas(self, user_ids, deltas):
+        """
+        Прибавляет к суммам пользователей изменения {ingredient_id: delta}:
+        одна вставка недостающих строк, одно обновление, одно удаление нулей.
+        """
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        self.bulk_create(
+            (
+                self.model(user_id=user_id, ingredient_id=ingredient_id,
+                           amount=0)
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ),
+            ignore_conflicts=True,
+        )
+        totals = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        totals.update(
+            amount=F("amount") + Case(
+                *(When(ingredient_id=ingredient_id, then=Value(delta))
+                  for ingredient_id, delta in deltas.items()),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        totals.filter(amount__lte=0).delete()
+
+    def add_recipe(self, user_ids, recipe_id, sign=1):
+        """
+        Добавляет (sign=1) или вычитает (sign=-1) ингредиенты рецепта.
+        Удалённый рецепт уже вычтен при скрытии и ничего не меняет.
+        """
+        amounts = apps.get_model(
+            "recipes", "RecipeIngredient"
+        ).objects.filter(
+            recipe_id=recipe_id, recipe__deleted_at__isnull=True
+        ).values_list("ingredient_id", "amount")
+        self.apply_deltas(
+            user_ids,
+            {ingredient_id: sign * amount
+             for ingredient_id, amount in amounts},
+        )
@@ -0,0 +1,94 @@
+from array import array
+from bisect import bisect_left
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import MEMBERSHIP_VERSION, bump_version
+
+
+FAVORITES = "favorites"
+SHOPPING_CART = "shopping_cart"
+FOLLOWINGS = "followings"
+
+SOURCES = {
+    FAVORITES: ("recipes.Favorite", "recipe_id"),
+    SHOPPING_CART: ("recipes.ShoppingCart", "recipe_id"),
+    FOLLOWINGS: ("users.Subscription", "author_id"),
+}
+
+MEMBERSHIP_KEY = "membership:{}:{}"
+ARRAY_TYPECODE = "q"
+
+
+class IdSet:
+    """Отсортированный массив id с поиском делением пополам."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __contains__(self, value):
+        index = bisect_left(self.ids, value)
+        return index < len(self.ids) and self.ids[index] == value
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+
+def _store_ids(user_id, kind, ids):
+    cache.set(
+        MEMBERSHIP_KEY.format(kind, user_id),
+        ids.tobytes(),
+        settings.MEMBERSHIP_CACHE_TIMEOUT,
+    )
+
+
+def _load_ids(user_id, kind):
+    model_label, field = SOURCES[kind]
+    ids = array(ARRAY_TYPECODE, sorted(
+        apps.get_model(model_label).objects.filter(
+            user_id=user_id).values_list(field, flat=True)
+    ))
+    _store_ids(user_id, kind, ids)
+    return ids
+
+
+def _get_cached_ids(user_id, kind):
+    packed = cache.get(MEMBERSHIP_KEY.format(kind, user_id))
+    if packed is None:
+        return None
+    ids = array(ARRAY_TYPECODE)
+    ids.frombytes(packed)
+    return ids
+
+
+def get_membership(user, kind):
+    """
+    Id рецептов в избранном/списке покупок или id авторов в подписках
+    пользователя. При промахе кэша набор собирается одним запросом.
+    """
+    if user is None or not user.is_authenticated:
+        return IdSet(array(ARRAY_TYPECODE))
+    ids = _get_cached_ids(user.id, kind)
+    if ids is None:
+        ids = _load_ids(user.id, kind)
+    return IdSet(ids)
+
+
+def invalidate_membership(user_id, kind):
+    """
+    Сбрасывает набор пользователя; следующий get_membership соберёт его
+    заново. Ключ удаляется сразу и ещё раз после коммита: иначе набор,
+    собранный параллельным запросом до коммита, остался бы в кэше.
+    """
+    def invalidate():
+        cache.delete(MEMBERSHIP_KEY.format(kind, user_id))
+        bump_version(MEMBERSHIP_VERSION.format(user_id))
+
+    invalidate()
+    transaction.on_commit(invalidate)
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255,
+                        unique=True,
+                        verbose_name="Путь в хранилище",
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveBigIntegerField(
+                        verbose_name="Размер, байт"),
+                ),
+                (
+                    "references",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Число ссылок"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Создан"),
+                ),
+            ],
+            options={
+                "verbose_name": "Файл медиа",
+                "verbose_name_plural": "Файлы медиа",
+            },
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=255, verbose_name="Задача"),
+                ),
+                (
+                    "args",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        verbose_name="Позиционные аргументы",
+                    ),
+                ),
+                (
+                    "kwargs",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        verbose_name="Именованные аргументы",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        blank=True,
+                        help_text="В очереди не бывает двух задач с одним ключом.",
+                        max_length=255,
+                        null=True,
+                        verbose_name="Ключ",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="queued",
+                        max_length=16,
+                        verbose_name="Состояние",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Попыток"
+                    ),
+                ),
+                (
+                    "max_attempts",
+                    models.PositiveSmallIntegerField(
+                        verbose_name="Попыток не больше"
+                    ),
+                ),
+                (
+                    "run_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Запустить не раньше",
+                    ),
+                ),
+                (
+                    "locked_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Взята воркером"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(
+                        blank=True, verbose_name="Последняя ошибка"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Создана"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Фоновая задача",
+                "verbose_name_plural": "Фоновые задачи",
+                "ordering": ("run_at", "id"),
+                "indexes": [
+                    models.Index(
+                        fields=["status", "run_at"], name="job_status_run_at"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="job",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "queued")),
+                fields=("key",),
+                name="unique_queued_job_key",
+            ),
+        ),
+    ]
@@ -1,6 +1,17 @@
+import hashlib
+import math
+
 from django.http import Http404
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
 from rest_framework.exceptions import NotFound
 
+from core.cache import get_versions
+
 
 class CustomGetObjectMixin:
     object = "Объект"
@@ -14,3 +25,48 @@ class CustomGetObjectMixin:
             return super().get_object()
         except Http404:
             raise NotFound(detail=self.not_found_detail)
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list и retrieve из версий данных,
+    без рендеринга тела; 304 Not Modified для неизменившихся ответов.
+    """
+    version_names = ()
+
+    def get_version_names(self):
+        return self.version_names
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_get(
+            super().retrieve, request, *args, **kwargs)
+
+    def _conditional_get(self, handler, request, *args, **kwargs):
+        versions = get_versions(*self.get_version_names())
+        validator = "{}|{}|{}|{}".format(
+            request.get_full_path(),
+            request.user.pk,
+            request.META.get("HTTP_ACCEPT", ""),
+            sorted(versions.items()),
+        )
+        etag = quote_etag(hashlib.md5(validator.encode()).hexdigest())
+        last_modified = (
+            math.ceil(max(versions.values()) / 1e9) if versions else None)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            patch_vary_headers(response, ("Authorization",))
+            patch_cache_control(
+                response,
+                no_cache=True,
+                private=request.user.is_authenticated,
+            )
+        return response
@@ -0,0 +1,114 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MediaBlob(models.Model):
+    """Файл хранилища ContentAddressedStorage и число ссылок на него."""
+
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name="Путь в хранилище",
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name="Размер, байт",
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Число ссылок",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Создан",
+    )
+
+    class Meta:
+        verbose_name = "Файл медиа"
+        verbose_name_plural = "Файлы медиа"
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
+class Job(models.Model):
+    """Фоновая задача очереди core.jobs; выполненные задачи удаляются."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(
+        max_length=255,
+        verbose_name="Задача",
+    )
+    args = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Позиционные аргументы",
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Именованные аргументы",
+    )
+    key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name="Ключ",
+        help_text="В очереди не бывает двух задач с одним ключом.",
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name="Состояние",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Попыток",
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name="Попыток не больше",
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Запустить не раньше",
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Взята воркером",
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="Последняя ошибка",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Создана",
+    )
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ("run_at", "id")
+        indexes = [
+            models.Index(
+                fields=("status", "run_at"), name="job_status_run_at"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=("key",),
+                condition=models.Q(status="queued"),
+                name="unique_queued_job_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
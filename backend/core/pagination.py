@@ -1,6 +1,162 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from core.cache import bump_version, get_version
+
+
+EXACT_COUNT = "exact"
+CACHED_COUNT = "cached"
+ESTIMATED_COUNT = "estimate"
+
+
+def count_version_name(model):
+    return f"count:{model._meta.label_lower}"
+
+
+def invalidate_cached_counts(model):
+    """Сбрасывает закэшированные количества объектов модели."""
+    bump_version(count_version_name(model))
+
+
+def exact_count(queryset):
+    return queryset.count()
+
+
+def cached_count(queryset):
+    """
+    Количество кэшируется по SQL-запросу, то есть по нормализованному
+    набору фильтров, и сбрасывается вместе с версией модели.
+    """
+    if queryset.query.is_empty():
+        # У queryset.none() нет SQL: str(query) бросает EmptyResultSet.
+        return 0
+    model = queryset.model
+    query = str(queryset.order_by().values("pk").query)
+    key = "count:{}:{}:{}".format(
+        model._meta.label_lower,
+        get_version(count_version_name(model)),
+        hashlib.md5(query.encode()).hexdigest(),
+    )
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT["CACHE_TIMEOUT"])
+    return count
+
+
+def is_unfiltered(queryset):
+    """
+    Нет фильтров, кроме скрытия удалённых объектов: скрытые строки
+    удаляет фоновая очистка, и оценка по всей таблице расходится ненамного.
+    """
+    where = queryset.query.where
+    if not where:
+        return True
+    model = queryset.model
+    try:
+        model._meta.get_field("deleted_at")
+    except FieldDoesNotExist:
+        return False
+    return where == model._base_manager.filter(
+        deleted_at__isnull=True).query.where
+
+
+def estimated_count(queryset):
+    """
+    Оценка планировщика PostgreSQL для списков без фильтров.
+    Небольшие таблицы и другие СУБД считаются точно.
+    """
+    connection = connections[queryset.db]
+    if not is_unfiltered(queryset) or connection.vendor != "postgresql":
+        return queryset.count()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE relname = %s",
+            (queryset.model._meta.db_table,),
+        )
+        row = cursor.fetchone()
+    estimate = int(row[0]) if row else -1
+    if estimate < settings.PAGINATION_COUNT["ESTIMATE_THRESHOLD"]:
+        return queryset.count()
+    return estimate
+
+
+COUNT_STRATEGIES = {
+    EXACT_COUNT: exact_count,
+    CACHED_COUNT: cached_count,
+    ESTIMATED_COUNT: estimated_count,
+}
+
+
+class CountStrategyPaginator(Paginator):
+
+    def __init__(self, *args, count_strategy=exact_count, **kwargs):
+        self.count_strategy = count_strategy
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        return self.count_strategy(self.object_list)
 
 
 class PageNumberLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_strategy = COUNT_STRATEGIES[self.get_count_mode(view)]
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountStrategyPaginator(
+            object_list, per_page, count_strategy=self.count_strategy)
+
+    @staticmethod
+    def get_count_mode(view):
+        """Режим подсчёта для эндпоинта `<basename>-<action>` из настроек."""
+        endpoint = "{}-{}".format(
+            getattr(view, "basename", None), getattr(view, "action", None))
+        return settings.PAGINATION_COUNT["MODES"].get(endpoint, EXACT_COUNT)
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = ("-pub_date", "-id")
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+
+class RecipePagination(PageNumberLimitPagination):
+    """
+    Постраничная пагинация по умолчанию, курсорная (без OFFSET и COUNT)
+    — при ?pagination=cursor или переданном курсоре.
+    """
+    mode_query_param = "pagination"
+    cursor_pagination_class = RecipeCursorPagination
+
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
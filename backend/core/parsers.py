@@ -0,0 +1,58 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """
+    multipart/form-data, где файлы приходят частями формы (их сохраняют
+    на диск обработчики загрузки Django), а остальные поля — JSON:
+    либо одной частью data, либо отдельными полями. Как JSON читаются
+    только поля из json_fields (например, ingredients='[{"id": 1,
+    "amount": 10}]'), остальные — строками как есть.
+    """
+
+    json_part = "data"
+    json_fields = ("tags", "ingredients")
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        data = {}
+        for key, values in parsed.data.lists():
+            if key == self.json_part:
+                data.update(self._load(values[-1], expect_object=True))
+            elif key in self.json_fields:
+                data[key] = self._load_list(values)
+            else:
+                data[key] = values if len(values) > 1 else values[0]
+        # Request склеивает data и files через dict.update, и из
+        # MultiValueDict в data попали бы списки — кладём файлы сами.
+        data.update(parsed.files.items())
+        return DataAndFiles(data, MultiValueDict())
+
+    def _load_list(self, values):
+        """
+        Поле-список: один JSON-массив (tags='[1, 2]') либо повторённое
+        поле (tags=1&tags=2); одно значение — тоже список.
+        """
+        values = [self._maybe_json(value) for value in values]
+        if len(values) == 1 and isinstance(values[0], list):
+            return values[0]
+        return values
+
+    def _maybe_json(self, value):
+        if value[:1] in ("[", "{"):
+            return self._load(value)
+        return value
+
+    def _load(self, value, expect_object=False):
+        try:
+            loaded = json.loads(value)
+        except ValueError as error:
+            raise ParseError(f"Некорректный JSON в форме: {error}")
+        if expect_object and not isinstance(loaded, dict):
+            raise ParseError(
+                f"Часть {self.json_part} должна быть JSON-объектом.")
+        return loaded
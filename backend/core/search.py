@@ -0,0 +1,98 @@
+from array import array
+from bisect import bisect_left
+import threading
+
+from django.conf import settings
+
+from core.cache import INGREDIENTS_VERSION, get_version
+from recipes.models import Ingredient
+
+
+TRIGRAM = 3
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов в памяти воркера.
+    Позиция ингредиента — его место в сортировке базы по name,
+    поэтому результаты идут в том же порядке, что и ORDER BY name.
+    """
+
+    def __init__(self, rows):
+        self.ids = array("q")
+        self.keys = []
+        for ingredient_id, name in rows:
+            self.ids.append(ingredient_id)
+            self.keys.append(self.normalize(name))
+        self.prefix_order = sorted(
+            range(len(self.keys)), key=self.keys.__getitem__)
+        self.prefix_keys = [self.keys[pos] for pos in self.prefix_order]
+        self.trigrams = {}
+        for position, key in enumerate(self.keys):
+            for trigram in {
+                key[i:i + TRIGRAM] for i in range(len(key) - TRIGRAM + 1)
+            }:
+                self.trigrams.setdefault(
+                    trigram, array("l")).append(position)
+
+    @staticmethod
+    def normalize(value):
+        # UPPER — как в istartswith/icontains на PostgreSQL.
+        return value.upper()
+
+    def search(self, value, limit=None):
+        """Id совпадений по префиксу, затем по подстроке, по порядку name."""
+        key = self.normalize(value)
+        prefix = self._prefix_positions(key)
+        if limit is not None and len(prefix) >= limit:
+            return [self.ids[pos] for pos in prefix[:limit]]
+        prefix_set = set(prefix)
+        remaining = None if limit is None else limit - len(prefix)
+        substring = []
+        for position in self._substring_candidates(key):
+            if position not in prefix_set and key in self.keys[position]:
+                substring.append(position)
+                if remaining is not None and len(substring) >= remaining:
+                    break
+        return [self.ids[pos] for pos in prefix + substring]
+
+    def _prefix_positions(self, key):
+        start = bisect_left(self.prefix_keys, key)
+        end = bisect_left(self.prefix_keys, key + "\U0010ffff", start)
+        return sorted(self.prefix_order[start:end])
+
+    def _substring_candidates(self, key):
+        if len(key) < TRIGRAM:
+            return range(len(self.keys))
+        postings = []
+        for i in range(len(key) - TRIGRAM + 1):
+            posting = self.trigrams.get(key[i:i + TRIGRAM])
+            if posting is None:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        return sorted(candidates)
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_ingredient_index():
+    """Индекс текущего воркера; перестраивается при смене версии."""
+    global _index, _index_version
+    version = get_version(INGREDIENTS_VERSION)
+    if _index_version != version:
+        with _index_lock:
+            if _index_version != version:
+                _index = IngredientIndex(
+                    Ingredient.objects.order_by("name", "id").values_list(
+                        "id", "name").iterator(
+                            chunk_size=settings.INGREDIENT_INDEX_CHUNK_SIZE)
+                )
+                _index_version = version
+    return _index
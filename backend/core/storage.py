@@ -0,0 +1,135 @@
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from core.models import MediaBlob
+
+
+SHARDS = re.compile(r"(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}$")
+
+
+def shard(directory, key, filename):
+    """recipes/images, abcd…, abcd….png → recipes/images/ab/cd/abcd….png."""
+    return posixpath.join(directory, key[:2], key[2:4], filename)
+
+
+def unshard(directory):
+    """Отрезает от каталога два уровня шардов, если они есть."""
+    return SHARDS.sub("", directory)
+
+
+def is_sharded(name):
+    return bool(SHARDS.search(posixpath.dirname(name)))
+
+
+@deconstructible
+class ShardedUploadTo:
+    """
+    upload_to, раскладывающий файлы по двум уровням каталогов
+    по случайному ключу, чтобы в одном каталоге не копились сотни тысяч
+    файлов. ContentAddressedStorage заменяет ключ хэшем содержимого.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, instance, filename):
+        key = uuid.uuid4().hex
+        extension = posixpath.splitext(filename)[1].lower()
+        return shard(self.directory, key, f"{key}{extension}")
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ShardedUploadTo)
+            and self.directory == other.directory
+        )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файлы называются по sha256 содержимого и раскладываются по двум
+    уровням каталогов: recipes/images/ab/cd/abcd….png. Одинаковые файлы
+    хранятся один раз; save() добавляет ссылку на файл, delete() её
+    снимает, а сам файл удаляется вместе с последней ссылкой.
+    Содержимое по имени не меняется, поэтому URL можно кэшировать навсегда.
+    """
+
+    hash_chunk_size = 64 * 1024
+
+    @staticmethod
+    def hashed_name(directory, digest, extension):
+        return shard(unshard(directory), digest, f"{digest}{extension}")
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хэшем в _save, а совпадение имён
+        # означает совпадение содержимого.
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks(self.hash_chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        name = self.hashed_name(directory, digest.hexdigest(), extension)
+        with transaction.atomic():
+            blob, _ = MediaBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={"size": size})
+            # Файл проверяем под блокировкой строки: sweep_media удаляет
+            # сирот под ней же и не удалит файл, на который только что
+            # появилась ссылка.
+            try:
+                # Свежее время изменения защищает файл периодом
+                # ожидания sweep_media.
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                # Файла нет — или его только что убрала очистка, для
+                # файла без строки MediaBlob блокировка ничего не держит.
+                # Пишем во временный файл и атомарно переименовываем:
+                # параллельная запись того же содержимого не оставит
+                # обрезанного файла.
+                temporary = super()._save(
+                    f"{name}.{uuid.uuid4().hex}.tmp", content)
+                os.replace(self.path(temporary), self.path(name))
+            MediaBlob.objects.filter(pk=blob.pk).update(
+                references=F("references") + 1)
+        return name
+
+    def delete(self, name):
+        """Снимает ссылку на файл; файлы вне учёта удаляются сразу."""
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(
+                name=name).first()
+            if blob is None:
+                super().delete(name)
+                return
+            MediaBlob.objects.filter(pk=blob.pk, references__gt=0).update(
+                references=F("references") - 1)
+            if blob.references > 1:
+                return
+        transaction.on_commit(lambda: self._unlink_unreferenced(name))
+
+    def _unlink_unreferenced(self, name):
+        """
+        Удаляет файл и строку без ссылок под блокировкой строки:
+        параллельный _save того же содержимого либо успеет добавить
+        ссылку раньше, либо дождётся удаления и запишет файл заново.
+        """
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(
+                name=name).first()
+            if blob is None or blob.references:
+                return
+            blob.delete()
+            super().delete(name)
@@ -1,5 +1,8 @@
 from django.contrib import admin
 
+from core.admin import SoftDeleteAdminMixin
+from core.deletion import soft_delete_recipes
+
 from .models import (
     Favorite,
     Ingredient,
@@ -19,11 +22,12 @@ class RecipeIngredientInline(admin.StackedInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ("name", "author", "favorites_count")
     search_fields = ("name", "author__username")
     list_filter = ("tags",)
     inlines = (RecipeIngredientInline,)
+    soft_delete = staticmethod(soft_delete_recipes)
 
     @admin.display(description="В избранном")
     def favorites_count(self, obj):
@@ -0,0 +1,140 @@
+import csv
+from itertools import cycle
+from statistics import median
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from core.cache import INGREDIENTS_VERSION, bump_version
+from core.filters import IngredientFilter
+from core.search import get_ingredient_index
+from recipes.models import Ingredient
+
+
+# Сигналы удаления и создания ингредиентов поднимают версии в кэше;
+# пусть они остаются в кэше процесса.
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение поиска ингредиентов через IngredientFilter.filter_name "
+        "(индекс в памяти или ORM для слишком широких запросов) и через ORM. "
+        "Каталог создаётся во временной базе (как у тестов, нужны права "
+        "на создание базы), рабочая база и общий кэш не затрагиваются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=(2_000, 50_000, 500_000),
+            help="Размеры каталога",
+        )
+        parser.add_argument(
+            "--queries",
+            nargs="+",
+            default=("с", "мол", "соус", "ко", "перец черн"),
+            help="Поисковые строки",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=None, help="Ограничение выдачи")
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Повторов на запрос")
+        parser.add_argument(
+            "--source",
+            default=settings.BASE_DIR / "data" / "ingredients.csv",
+            help="CSV с названиями ингредиентов",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["source"], encoding="utf-8") as csvfile:
+            base_rows = list(csv.reader(csvfile))
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                for size in options["sizes"]:
+                    with transaction.atomic():
+                        self.benchmark(size, base_rows, options)
+                        transaction.set_rollback(True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, size, base_rows, options):
+        Ingredient.objects.all().delete()
+        rows = cycle(base_rows)
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=name if index < len(base_rows)
+                    else f"{name} {index // len(base_rows)}",
+                    measurement_unit=unit,
+                )
+                for index, (name, unit) in zip(range(size), rows)
+            ),
+            batch_size=5_000,
+        )
+        # bulk_create не шлёт сигналов: индекс перестроится по новой версии.
+        bump_version(INGREDIENTS_VERSION)
+        started = time.perf_counter()
+        index = get_ingredient_index()
+        self.stdout.write(
+            f"\nКаталог {size}: индекс построен за "
+            f"{(time.perf_counter() - started) * 1000:.0f} мс"
+        )
+        queryset = Ingredient.objects.all()
+        limit = options["limit"]
+        max_ids = settings.INGREDIENT_SEARCH_MAX_IDS
+        for value in options["queries"]:
+            orm_time, orm_ids = self.measure(
+                lambda: IngredientFilter.filter_name_orm(queryset, value),
+                limit,
+                options["repeat"],
+            )
+            # Тот же путь, что у эндпоинта: filter_name сам решает,
+            # искать по индексу или уйти в ORM.
+            filter_time, filter_ids = self.measure(
+                lambda: IngredientFilter(
+                    {"name": value, "limit": limit}, queryset=queryset).qs,
+                None,
+                options["repeat"],
+            )
+            found = len(index.search(value, limit or max_ids + 1))
+            path = "ORM" if found > max_ids else "индекс"
+            self.stdout.write(
+                f"  {value!r:>14}: ORM {orm_time:8.2f} мс, "
+                f"filter_name ({path}) {filter_time:8.2f} мс, "
+                f"найдено {len(orm_ids)}"
+                + ("" if orm_ids == filter_ids else self.mismatch())
+            )
+
+    @staticmethod
+    def mismatch():
+        if connection.vendor == "sqlite":
+            # LIKE и UPPER в SQLite не меняют регистр кириллицы, а индекс
+            # сравнивает без регистра, как PostgreSQL.
+            return ", РАСХОДИТСЯ С ORM (ожидаемо на SQLite)"
+        return ", РАСХОДИТСЯ С ORM"
+
+    @staticmethod
+    def measure(build_queryset, limit, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = build_queryset()
+            if limit:
+                queryset = queryset[:limit]
+            ids = list(queryset.values_list("id", flat=True))
+            timings.append((time.perf_counter() - started) * 1000)
+        return median(timings), ids
@@ -0,0 +1,77 @@
+import base64
+import io
+import os
+from statistics import median
+import time
+
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.serializers import RecipeWriteSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Время валидации заведомо неверного рецепта с большой картинкой: "
+        "с отложенным и с немедленным декодированием base64."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=(1, 4, 8),
+            help="Примерный размер картинки, МБ",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Повторов на замер")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"МБ":>4} {"base64, МБ":>11} {"сразу, мс":>10} '
+            f'{"отложено, мс":>13}'
+        )
+        for size in options["sizes"]:
+            image = self.make_image(size)
+            payload = {
+                "name": "",
+                "text": "Рецепт без названия и с несуществующим тегом.",
+                "cooking_time": 10,
+                "tags": [1_000_000],
+                "ingredients": [{"id": 1_000_000, "amount": 1}],
+                "image": image,
+            }
+            eager = self.measure(payload, False, options["repeat"])
+            deferred = self.measure(payload, True, options["repeat"])
+            self.stdout.write(
+                f"{size:>4} {len(image) / 2**20:>11.1f} "
+                f"{eager:>10.1f} {deferred:>13.1f}"
+            )
+
+    @staticmethod
+    def make_image(size_mb):
+        """PNG из шума: почти не сжимается, размер близок к заданному."""
+        side = int((size_mb * 2**20 / 3) ** 0.5)
+        image = Image.frombytes(
+            "RGB", (side, side), os.urandom(side * side * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return "data:image/png;base64," + base64.b64encode(
+            buffer.getvalue()).decode()
+
+    @staticmethod
+    def measure(payload, defer_decoding, repeat):
+        timings = []
+        for _ in range(repeat):
+            serializer = RecipeWriteSerializer(data=payload)
+            serializer.fields["image"].defer_decoding = defer_decoding
+            start = time.perf_counter()
+            valid = serializer.is_valid()
+            timings.append((time.perf_counter() - start) * 1000)
+            if valid:
+                raise CommandError(
+                    "Нагрузка должна не проходить валидацию, "
+                    "иначе замер не отражает ранний отказ."
+                )
+        return median(timings)
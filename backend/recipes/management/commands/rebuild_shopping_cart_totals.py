@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import ShoppingCart, ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчёт таблицы сумм ингредиентов в списках покупок. "
+        "С --verify только сверяет таблицу с агрегацией по корзинам."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Сверить без пересчёта; расхождения — ошибка",
+        )
+        parser.add_argument(
+            "--users",
+            nargs="+",
+            type=int,
+            default=None,
+            help="Ограничиться пользователями с этими id",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["users"]
+        expected = self.ground_truth(user_ids)
+        if options["verify"]:
+            mismatches = self.compare(expected, self.stored(user_ids))
+            for key, (want, got) in sorted(mismatches.items()):
+                self.stderr.write(
+                    f"user={key[0]} ingredient={key[1]}: "
+                    f"ожидалось {want}, в таблице {got}"
+                )
+            if mismatches:
+                raise CommandError(f"Расхождений: {len(mismatches)}.")
+            self.stdout.write(self.style.SUCCESS(
+                f"Таблица совпадает с корзинами ({len(expected)} строк)."))
+            return
+        with transaction.atomic():
+            totals = ShoppingCartTotal.objects.all()
+            if user_ids is not None:
+                totals = totals.filter(user_id__in=user_ids)
+            totals.delete()
+            ShoppingCartTotal.objects.bulk_create(
+                (
+                    ShoppingCartTotal(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        amount=amount)
+                    for (user_id, ingredient_id), amount in expected.items()
+                ),
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано строк: {len(expected)}."))
+
+    @staticmethod
+    def ground_truth(user_ids):
+        carts = ShoppingCart.objects.filter(recipe__deleted_at__isnull=True)
+        if user_ids is not None:
+            carts = carts.filter(user_id__in=user_ids)
+        rows = carts.values_list(
+            "user_id", "recipe__recipe_ingredients__ingredient_id"
+        ).annotate(
+            total=Sum("recipe__recipe_ingredients__amount")
+        ).order_by()
+        return {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in rows
+            if ingredient_id is not None
+        }
+
+    @staticmethod
+    def stored(user_ids):
+        totals = ShoppingCartTotal.objects.all()
+        if user_ids is not None:
+            totals = totals.filter(user_id__in=user_ids)
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in totals.values_list(
+                "user_id", "ingredient_id", "amount")
+        }
+
+    @staticmethod
+    def compare(expected, stored):
+        return {
+            key: (expected.get(key), stored.get(key))
+            for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        }
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:06
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+import core.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0008_alter_recipe_cooking_time_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="cooking_time",
+            field=core.fields.FromOneSmallIntegerField(
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MinValueValidator(1),
+                ],
+                verbose_name="Время приготовления (в минутах)",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="recipeingredient",
+            name="amount",
+            field=core.fields.FromOneSmallIntegerField(
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MinValueValidator(1),
+                ],
+                verbose_name="Количество",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ShoppingCartTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.IntegerField(verbose_name="Количество")),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shopping_cart_totals",
+                        to="recipes.ingredient",
+                        verbose_name="Ингредиент",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shopping_cart_totals",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сумма ингредиента в списке покупок",
+                "verbose_name_plural": "Суммы ингредиентов в списках покупок",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="shoppingcarttotal",
+            constraint=models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_shopping_cart_total",
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO recipes_shoppingcarttotal
+                    (user_id, ingredient_id, amount)
+                SELECT cart.user_id, ri.ingredient_id, SUM(ri.amount)
+                FROM recipes_shoppingcart AS cart
+                JOIN recipes_recipeingredient AS ri
+                    ON ri.recipe_id = cart.recipe_id
+                GROUP BY cart.user_id, ri.ingredient_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
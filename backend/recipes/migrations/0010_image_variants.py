@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0009_shoppingcarttotal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="Уменьшенные копии изображения",
+            ),
+        ),
+    ]
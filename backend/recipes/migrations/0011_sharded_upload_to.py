@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+import core.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0010_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="image",
+            field=models.ImageField(
+                upload_to=core.storage.ShardedUploadTo("recipes/images"),
+                verbose_name="Изображение",
+            ),
+        ),
+    ]
@@ -1,8 +1,21 @@
 from django.core.validators import RegexValidator
 from django.db import models
-from django.db.models.signals import post_delete
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
 from django.dispatch import receiver
 
+from core.cache import (
+    CATALOGUE_VERSION,
+    INGREDIENTS_VERSION,
+    RECIPE_VERSION,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+    bump_version,
+)
 from core.constants import (
     INGREDIENT_TITLE_MAX_LENGTH,
     MEASUREMENT_UNIT_MAX_LENGTH,
@@ -10,6 +23,23 @@ from core.constants import (
     TAG_FIELD_MAX_LENGTH,
 )
 from core.fields import FromOneSmallIntegerField
+from core.images import (
+    delete_variants,
+    release_replaced_image,
+    schedule_variants,
+)
+from core.managers import (
+    RecipeManager,
+    RecipeQuerySet,
+    ShoppingCartTotalQuerySet,
+)
+from core.membership import (
+    FAVORITES,
+    SHOPPING_CART,
+    invalidate_membership,
+)
+from core.pagination import invalidate_cached_counts
+from core.storage import ShardedUploadTo
 from users.models import User
 
 
@@ -72,7 +102,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         verbose_name="Изображение",
-        upload_to="recipes/images/",
+        upload_to=ShardedUploadTo("recipes/images"),
     )
     text = models.TextField(
         "Описание рецепта",
@@ -102,6 +132,22 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name="Дата публикации",
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Уменьшенные копии изображения",
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Удалён",
+    )
+
+    objects = RecipeManager()
+    all_objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
@@ -196,7 +242,168 @@ class Favorite(models.Model):
         return f"{self.user} добавил в избранное: {self.recipe}"
 
 
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_cart_totals",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_cart_totals",
+        verbose_name="Ингредиент",
+    )
+    amount = models.IntegerField(
+        verbose_name="Количество",
+    )
+
+    objects = ShoppingCartTotalQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Сумма ингредиента в списке покупок"
+        verbose_name_plural = "Суммы ингредиентов в списках покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_shopping_cart_total",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient} — {self.amount}"
+
+
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_saved_row(sender, instance, **kwargs):
+    """Суммы в списках покупок пересчитываются по разнице со строкой в базе."""
+    instance._saved_row = instance.pk and sender.objects.filter(
+        pk=instance.pk).first()
+
+
+def add_to_carts(recipe_id, ingredient_id, delta):
+    """
+    Прибавляет delta к ингредиенту у всех, у кого рецепт в покупках.
+    Удалённый рецепт уже вычтен при скрытии.
+    """
+    if delta:
+        ShoppingCartTotal.objects.apply_deltas(
+            ShoppingCart.objects.filter(
+                recipe_id=recipe_id, recipe__deleted_at__isnull=True
+            ).values_list("user_id", flat=True),
+            {ingredient_id: delta},
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_cart_to_totals(sender, instance, **kwargs):
+    previous = instance.__dict__.pop("_saved_row", None)
+    if previous is not None:
+        if (previous.user_id, previous.recipe_id) == (
+                instance.user_id, instance.recipe_id):
+            return
+        ShoppingCartTotal.objects.add_recipe(
+            [previous.user_id], previous.recipe_id, sign=-1)
+    ShoppingCartTotal.objects.add_recipe(
+        [instance.user_id], instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def subtract_cart_from_totals(sender, instance, **kwargs):
+    ShoppingCartTotal.objects.add_recipe(
+        [instance.user_id], instance.recipe_id, sign=-1)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def add_recipe_ingredient_to_carts(sender, instance, **kwargs):
+    deltas = {(instance.recipe_id, instance.ingredient_id): instance.amount}
+    previous = instance.__dict__.pop("_saved_row", None)
+    if previous is not None:
+        key = previous.recipe_id, previous.ingredient_id
+        deltas[key] = deltas.get(key, 0) - previous.amount
+    for (recipe_id, ingredient_id), delta in deltas.items():
+        add_to_carts(recipe_id, ingredient_id, delta)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def subtract_recipe_ingredient_from_carts(sender, instance, **kwargs):
+    add_to_carts(instance.recipe_id, instance.ingredient_id, -instance.amount)
+
+
 @receiver(post_delete, sender=Recipe)
 def delete_recipe_image(sender, instance, **kwargs):
     if instance.image:
+        delete_variants(instance.image.storage, instance.image_variants)
         instance.image.delete(save=False)
+
+
+@receiver(pre_save, sender=Recipe)
+def release_replaced_recipe_image(sender, instance, update_fields=None,
+                                  **kwargs):
+    release_replaced_image(instance, "image", update_fields)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_recipe_image_variants(sender, instance, **kwargs):
+    schedule_variants(
+        instance, "image", "recipe",
+        versions=(RECIPE_VERSION.format(instance.pk), RECIPES_VERSION),
+    )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_recipe_counts(sender, created=True, **kwargs):
+    if created:
+        invalidate_cached_counts(Recipe)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_recipe_membership(sender, instance, **kwargs):
+    invalidate_membership(
+        instance.user_id,
+        FAVORITES if sender is Favorite else SHOPPING_CART,
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_counts_on_tags(sender, action, **kwargs):
+    if action.startswith("post_"):
+        invalidate_cached_counts(Recipe)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipe_version(sender, instance, **kwargs):
+    bump_version(RECIPE_VERSION.format(instance.pk), RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def bump_recipe_version_on_ingredients(sender, instance, **kwargs):
+    bump_version(RECIPE_VERSION.format(instance.recipe_id), RECIPES_VERSION)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_version_on_tags(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        bump_version(RECIPE_VERSION.format(instance.pk), RECIPES_VERSION)
+    elif pk_set:
+        bump_version(
+            *(RECIPE_VERSION.format(pk) for pk in pk_set), RECIPES_VERSION)
+    else:
+        bump_version(CATALOGUE_VERSION, RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_catalogue_version(sender, **kwargs):
+    bump_version(
+        CATALOGUE_VERSION,
+        TAGS_VERSION if sender is Tag else INGREDIENTS_VERSION,
+    )
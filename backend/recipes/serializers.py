@@ -1,15 +1,33 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 from rest_framework import serializers
 
+from core.cache import (
+    CATALOGUE_VERSION,
+    RECIPE_VERSION,
+    RECIPES_VERSION,
+    USER_VERSION,
+    bump_version,
+    get_versions,
+)
 from core.exceptions import ValidationError
-from core.fields import CustomBase64ImageField
+from core.fields import (
+    BulkPrimaryKeyRelatedField,
+    CustomBase64ImageField,
+    ImageVariantsField,
+)
+from core.membership import FAVORITES, SHOPPING_CART, get_membership
 from users.serializers import UserProfileSerializer
 
 from .models import (
-    Favorite,
     Ingredient,
     Recipe,
     RecipeIngredient,
-    ShoppingCart,
+    ShoppingCartTotal,
     Tag,
 )
 
@@ -27,9 +45,11 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField("image", "recipe")
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
 
 
 class RecipeIngredientReadSerializer(serializers.ModelSerializer):
@@ -52,6 +72,7 @@ class BaseRecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField("image", "recipe")
 
     class Meta:
         model = Recipe
@@ -64,47 +85,149 @@ class BaseRecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
 
     def get_is_favorited(self, obj):
-        request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return Favorite.objects.filter(
-                user=request.user, recipe=obj).exists()
-        return False
+        return self._get_user_flag(obj, "favorited", FAVORITES)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return ShoppingCart.objects.filter(
-                user=request.user, recipe=obj).exists()
-        return False
+        return self._get_user_flag(obj, "in_shopping_cart", SHOPPING_CART)
+
+    def _get_user_flag(self, obj, annotation, kind):
+        """
+        Флаг берётся из аннотации RecipeQuerySet.with_user_flags,
+        вне вьюсета — из кэша id пользователя.
+        """
+        flag = getattr(obj, annotation, None)
+        if flag is not None:
+            return flag
+        memberships = self.context.setdefault("memberships", {})
+        if kind not in memberships:
+            request = self.context.get("request")
+            memberships[kind] = get_membership(
+                request.user if request else None, kind)
+        return obj.id in memberships[kind]
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return self.child.to_representations(list(recipes))
 
 
 class RecipeReadSerializer(BaseRecipeSerializer):
-    pass
+    """
+    Общая для всех пользователей часть рецепта кэшируется по id и версиям
+    рецепта, автора и справочников; личные флаги добавляются при ответе.
+    """
+    PERSONAL_FIELDS = ("is_favorited", "is_in_shopping_cart")
+
+    class Meta(BaseRecipeSerializer.Meta):
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representations([instance])[0]
+
+    def to_representations(self, recipes):
+        keys = self._get_cache_keys(recipes)
+        shared = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in shared]
+        if missing:
+            prefetch_related_objects(
+                missing, *Recipe.objects.read_prefetches())
+            fresh = {
+                keys[recipe.pk]: self._get_shared_representation(recipe)
+                for recipe in missing
+            }
+            cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+            shared.update(fresh)
+        return [
+            self._personalize(shared[keys[recipe.pk]], recipe)
+            for recipe in recipes
+        ]
+
+    def _get_cache_keys(self, recipes):
+        names = {CATALOGUE_VERSION}
+        for recipe in recipes:
+            names.add(RECIPE_VERSION.format(recipe.pk))
+            names.add(USER_VERSION.format(recipe.author_id))
+        versions = get_versions(*names)
+        request = self.context.get("request")
+        base_url = request.build_absolute_uri("/") if request else ""
+        return {
+            recipe.pk: "recipe-representation:{}:{}:{}:{}:{}".format(
+                recipe.pk,
+                versions[RECIPE_VERSION.format(recipe.pk)],
+                versions[USER_VERSION.format(recipe.author_id)],
+                versions[CATALOGUE_VERSION],
+                base_url,
+            )
+            for recipe in recipes
+        }
+
+    def _get_shared_representation(self, recipe):
+        data = super().to_representation(recipe)
+        for field in self.PERSONAL_FIELDS:
+            data.pop(field)
+        return data
+
+    def _personalize(self, shared, recipe):
+        data = dict(shared)
+        data["is_favorited"] = self.get_is_favorited(recipe)
+        data["is_in_shopping_cart"] = self.get_is_in_shopping_cart(recipe)
+        data["author"] = dict(
+            data["author"],
+            is_subscribed=self.fields["author"].get_is_subscribed(
+                recipe.author),
+        )
+        return data
+
+
+class RecipeIngredientWriteListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+        ids = [
+            item["id"] for item in data
+            if isinstance(item, dict) and "id" in item
+        ]
+        with self.child.fields["id"].preloaded(ids):
+            return super().to_internal_value(data)
 
 
 class RecipeIngredientWriteSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(min_value=1, write_only=True)
 
+    class Meta:
+        list_serializer_class = RecipeIngredientWriteListSerializer
+
 
 class RecipeWriteSerializer(BaseRecipeSerializer):
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True)
     ingredients = RecipeIngredientWriteSerializer(many=True)
-    image = CustomBase64ImageField()
+    image = CustomBase64ImageField(defer_decoding=True)
 
     class Meta(BaseRecipeSerializer.Meta):
         model = Recipe
         fields = BaseRecipeSerializer.Meta.fields
 
     def to_representation(self, instance):
-        return RecipeReadSerializer(instance, context=self.context).data
+        request = self.context.get("request")
+        recipes = Recipe.objects.with_read_plan()
+        if request:
+            recipes = recipes.with_user_flags(request.user)
+        return RecipeReadSerializer(
+            recipes.get(pk=instance.pk), context=self.context
+        ).data
 
     def validate_ingredients(self, value):
         value = self._validate_nonempty(
@@ -152,6 +275,11 @@ class RecipeWriteSerializer(BaseRecipeSerializer):
                 object_name="Теги",
                 lookup=lambda tag: tag.id,
             )
+        if "image" in data:
+            try:
+                data["image"] = self.fields["image"].decode(data["image"])
+            except serializers.ValidationError as error:
+                raise ValidationError({"image": error.detail})
         return data
 
     def create(self, validated_data):
@@ -160,13 +288,18 @@ class RecipeWriteSerializer(BaseRecipeSerializer):
         request = self.context.get("request")
         author = request.user if request else None
 
-        recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.tags.set(tags_data)
-
-        for item in ingredients_data:
-            recipe.ingredients.add(
-                item.get("id"), through_defaults={"amount": item.get("amount")}
+        with transaction.atomic():
+            recipe = Recipe.objects.create(author=author, **validated_data)
+            recipe.tags.set(tags_data)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=item.get("id"),
+                    amount=item.get("amount"),
+                )
+                for item in ingredients_data
             )
+            self._bump_on_commit(recipe)
 
         return recipe
 
@@ -174,21 +307,73 @@ class RecipeWriteSerializer(BaseRecipeSerializer):
         ingredients_data = validated_data.pop("ingredients", None)
         tags_data = validated_data.pop("tags", None)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if tags_data is not None:
+                instance.tags.set(tags_data)
+
+            if ingredients_data is not None:
+                deltas = self._sync_ingredients(instance, ingredients_data)
+                # Удалённые строки вычитаются из сумм сигналом post_delete,
+                # массовые вставка и обновление сигналов не шлют.
+                ShoppingCartTotal.objects.apply_deltas(
+                    instance.is_in_shopping_cart.values_list(
+                        "user_id", flat=True),
+                    deltas,
+                )
+                self._bump_on_commit(instance)
 
-        if tags_data is not None:
-            instance.tags.set(tags_data)
+        return instance
 
-        if ingredients_data is not None:
-            instance.ingredients.clear()
-            for item in ingredients_data:
-                instance.ingredients.add(
-                    item.get("id"), through_defaults={
-                        "amount": item.get("amount")})
+    @staticmethod
+    def _sync_ingredients(recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к ingredients_data не более чем тремя
+        запросами: удаление, обновление количеств, вставка.
+        Возвращает изменения количеств {ingredient_id: delta} от вставки
+        и обновления.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.only(
+                "id", "ingredient_id", "amount")
+        }
+        wanted = {
+            item.get("id").id: item.get("amount")
+            for item in ingredients_data
+        }
+        deltas = {}
+        removed = current.keys() - wanted.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        created = []
+        for ingredient_id, amount in wanted.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                created.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id,
+                    amount=amount))
+                deltas[ingredient_id] = amount
+            elif recipe_ingredient.amount != amount:
+                deltas[ingredient_id] = amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ("amount",))
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        return deltas
 
-        return instance
+    @staticmethod
+    def _bump_on_commit(recipe):
+        """Массовые операции не шлют сигналы: версию рецепта поднимаем сами."""
+        transaction.on_commit(partial(
+            bump_version, RECIPE_VERSION.format(recipe.pk), RECIPES_VERSION))
 
     @staticmethod
     def _validate_nonempty(value, object_name, field_name):
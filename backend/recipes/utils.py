@@ -1,24 +1,71 @@
-from recipes.models import Recipe
+import csv
+import json
 
+from django.db.models import F
 
-def generate_shopping_list(user):
-    recipes = Recipe.objects.filter(
-        is_in_shopping_cart__user=user).prefetch_related(
-        'recipe_ingredients__ingredient'
+from recipes.models import ShoppingCartTotal
+
+
+SHOPPING_LIST_CHUNK_SIZE = 2000
+
+
+def get_shopping_cart_totals(user):
+    """Суммы ингредиентов из поддерживаемой таблицы ShoppingCartTotal."""
+    return (
+        ShoppingCartTotal.objects.filter(user=user)
+        .values(
+            "ingredient_id",
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            total_amount=F("amount"),
+        )
+        .order_by("ingredient__name", "ingredient_id")
     )
 
-    ingredients = {}
-    for recipe in recipes:
-        for recipe_ingredient in recipe.recipe_ingredients.all():
-            key = (
-                recipe_ingredient.ingredient.name,
-                recipe_ingredient.ingredient.measurement_unit,
-            )
-            ingredients[key] = (
-                ingredients.get(key, 0) + recipe_ingredient.amount
-            )
-
-    lines = ["Список покупок:"]
-    for (name, unit), amount in ingredients.items():
-        lines.append(f"- {name} ({unit}) — {amount}")
-    return "\n".join(lines)
+
+def _iter_totals(user):
+    for item in get_shopping_cart_totals(user).iterator(
+        chunk_size=SHOPPING_LIST_CHUNK_SIZE
+    ):
+        yield (
+            item["ingredient__name"],
+            item["ingredient__measurement_unit"],
+            item["total_amount"],
+        )
+
+
+def generate_shopping_list(user):
+    yield "Список покупок:\n"
+    for name, unit, amount in _iter_totals(user):
+        yield f"- {name} ({unit}) — {amount}\n"
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def generate_shopping_list_csv(user):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for row in _iter_totals(user):
+        yield writer.writerow(row)
+
+
+def generate_shopping_list_json(user):
+    yield "["
+    separator = ""
+    for name, unit, amount in _iter_totals(user):
+        yield separator + json.dumps(
+            {"name": name, "measurement_unit": unit, "amount": amount},
+            ensure_ascii=False,
+        )
+        separator = ","
+    yield "]"
+
+
+SHOPPING_LIST_FORMATS = {
+    "txt": ("text/plain", generate_shopping_list),
+    "csv": ("text/csv", generate_shopping_list_csv),
+    "json": ("application/json", generate_shopping_list_json),
+}
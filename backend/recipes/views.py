@@ -1,15 +1,32 @@
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 
+from core.cache import (
+    CATALOGUE_VERSION,
+    INGREDIENTS_VERSION,
+    MEMBERSHIP_VERSION,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+)
+from core.deletion import soft_delete_recipes
 from core.filters import IngredientFilter, RecipeFilter
-from core.mixins import CustomGetObjectMixin
+from core.mixins import ConditionalGetMixin, CustomGetObjectMixin
+from core.pagination import RecipePagination
+from core.parsers import MultiPartJSONParser
 from core.permissions import IsAuthorOrReadOnly
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
 from recipes.serializers import (
     IngredientSerializer,
     RecipeReadSerializer,
@@ -19,15 +36,19 @@ from recipes.serializers import (
 )
 
 
-class TagViewSet(CustomGetObjectMixin, viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, CustomGetObjectMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
+    version_names = (TAGS_VERSION,)
     serializer_class = TagSerializer
     pagination_class = None
     object = "Тег"
 
 
-class IngredientViewSet(CustomGetObjectMixin, viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, CustomGetObjectMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
+    version_names = (INGREDIENTS_VERSION,)
     serializer_class = IngredientSerializer
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
@@ -35,8 +56,11 @@ class IngredientViewSet(CustomGetObjectMixin, viewsets.ReadOnlyModelViewSet):
     object = "Ингредиент"
 
 
-class RecipeViewSet(CustomGetObjectMixin, viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, CustomGetObjectMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
+    pagination_class = RecipePagination
+    parser_classes = (JSONParser, MultiPartJSONParser)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     object = "Рецепт"
@@ -48,12 +72,17 @@ class RecipeViewSet(CustomGetObjectMixin, viewsets.ModelViewSet):
         },
         "favorite": {
             "prepositional": "в избранном",
-            "genitive": "из избранного"},
+            "genitive": "из избранного",
+        },
     }
 
     def get_queryset(self):
-        queryset = Recipe.objects.all()
         user = self.request.user
+        queryset = Recipe.objects.with_user_flags(user)
+        if self.action in ("list", "retrieve"):
+            # Теги и ингредиенты догружаются сериализатором только для
+            # рецептов, которых нет в кэше представлений.
+            queryset = queryset.select_related("author")
         filter_params = (
             ("is_in_shopping_cart", "is_in_shopping_cart__user"),
             ("is_favorited", "is_favorited__user"),
@@ -69,6 +98,12 @@ class RecipeViewSet(CustomGetObjectMixin, viewsets.ModelViewSet):
 
         return queryset
 
+    def get_version_names(self):
+        names = [RECIPES_VERSION, CATALOGUE_VERSION]
+        if self.request.user.is_authenticated:
+            names.append(MEMBERSHIP_VERSION.format(self.request.user.pk))
+        return names
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
@@ -81,6 +116,9 @@ class RecipeViewSet(CustomGetObjectMixin, viewsets.ModelViewSet):
             return (IsAuthorOrReadOnly(),)
         return super().get_permissions()
 
+    def perform_destroy(self, instance):
+        soft_delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
     @action(detail=True, methods=("get",), url_path="get-link")
     def get_link(self, request, *args, **kwargs):
         recipe = self.get_object()
@@ -135,14 +173,42 @@ class RecipeViewSet(CustomGetObjectMixin, viewsets.ModelViewSet):
             request, Favorite, self.ACTION_CASES["favorite"]
         )
 
+    @action(detail=False, methods=("get",),
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_totals(self, request):
+        """Текущие суммы ингредиентов в списке покупок."""
+        from recipes.utils import get_shopping_cart_totals
+
+        return Response([
+            {
+                "id": item["ingredient_id"],
+                "name": item["ingredient__name"],
+                "measurement_unit": item["ingredient__measurement_unit"],
+                "amount": item["total_amount"],
+            }
+            for item in get_shopping_cart_totals(request.user)
+        ])
+
     @action(detail=False, methods=("get",),
             permission_classes=(IsAuthenticated,))
     def download_shopping_cart(self, request):
-        from recipes.utils import generate_shopping_list
+        """Список покупок построчно; формат — ?file_format=txt|csv|json."""
+        from recipes.utils import SHOPPING_LIST_FORMATS
 
-        txt_content = generate_shopping_list(request.user)
-        response = HttpResponse(txt_content, content_type="text/plain")
+        file_format = request.query_params.get("file_format", "txt")
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {"file_format": [
+                    "Допустимые форматы: "
+                    f'{", ".join(SHOPPING_LIST_FORMATS)}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        content_type, generate = SHOPPING_LIST_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            generate(request.user),
+            content_type=f"{content_type}; charset=utf-8",
+        )
         response["Content-Disposition"] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{file_format}"'
         )
         return response
@@ -4,6 +4,7 @@ import sys
 import tempfile
 
 from django.conf import settings
+from django.core.cache import cache
 import pytest
 
 
@@ -36,3 +37,15 @@ def temp_media_root():
     settings.MEDIA_ROOT = temp_dir
     yield
     shutil.rmtree(temp_dir)
+
+
+@pytest.fixture(autouse=True)
+def eager_jobs():
+    settings.JOBS_EAGER = True
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
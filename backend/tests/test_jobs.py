@@ -0,0 +1,112 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.core.management import call_command
+from django.utils import timezone
+import pytest
+
+from core.jobs import PERIODIC, claim, enqueue, job, run
+from core.models import Job
+
+
+JOB_ADMIN_URL = "/admin/core/job/"
+
+CALLS = []
+
+
+@job
+def remember(value):
+    CALLS.append(value)
+
+
+@job
+def tick():
+    CALLS.append("tick")
+
+
+@job(max_attempts=2)
+def explode():
+    raise RuntimeError("Сбой задачи")
+
+
+@pytest.fixture
+def calls(settings):
+    """Задачи ставятся в очередь, а не выполняются сразу."""
+    settings.JOBS_EAGER = False
+    CALLS.clear()
+    return CALLS
+
+
+@pytest.mark.django_db
+class TestJobs:
+
+    def test_worker_runs_and_removes_queued_jobs(self, calls):
+        """Воркер выполняет задачи по порядку и удаляет выполненные."""
+        remember.delay(1)
+        remember.delay(2)
+        assert calls == [], "Задача не должна выполняться при постановке."
+
+        call_command("run_jobs", "--once")
+        assert calls == [1, 2]
+        assert not Job.objects.filter(name=remember.job_name).exists()
+
+    def test_failed_job_is_retried_with_backoff(self, calls, settings):
+        """Упавшая задача повторяется после паузы, затем остаётся с ошибкой."""
+        settings.JOBS_RETRY_BACKOFF = 60
+        explode.delay()
+        [taken] = claim(10)
+        assert not run(taken)
+        failed = Job.objects.get()
+        assert failed.status == Job.QUEUED and failed.attempts == 1
+        assert "Сбой задачи" in failed.last_error
+        delay = failed.run_at - timezone.now()
+        assert timedelta(seconds=50) < delay <= timedelta(seconds=60), delay
+        assert claim(10) == [], "До конца паузы задачу брать нельзя."
+
+        Job.objects.update(run_at=timezone.now())
+        [taken] = claim(10)
+        assert taken.attempts == 2
+        run(taken)
+        assert Job.objects.get().status == Job.FAILED
+
+    def test_job_with_same_key_is_not_duplicated(self, calls):
+        """Задача с тем же ключом не дублируется, а ждущая идёт раньше."""
+        enqueue(remember, args=(1,), key="remember",
+                run_at=timezone.now() + timedelta(hours=1))
+        enqueue(remember, args=(2,), key="remember")
+        queued = Job.objects.get()
+        assert queued.args == [1]
+        assert queued.run_at <= timezone.now()
+
+    def test_periodic_job_is_rescheduled(self, calls, monkeypatch):
+        """После выполнения периодическая задача встаёт в очередь снова."""
+        monkeypatch.setitem(
+            PERIODIC, tick.job_name, (tick, timedelta(minutes=5)))
+        call_command("run_jobs", "--once")
+        assert calls == ["tick"]
+        queued = Job.objects.get(key=tick.job_name)
+        assert queued.run_at > timezone.now() + timedelta(minutes=4)
+
+    def test_admin_shows_queue_depth_and_retries_failed(
+        self, calls, admin_client
+    ):
+        """В админке видна глубина очереди, упавшие можно перезапустить."""
+        remember.delay(1)
+        failed = Job.objects.create(
+            name=explode.job_name,
+            status=Job.FAILED,
+            attempts=2,
+            max_attempts=2,
+            last_error="Traceback...\nRuntimeError: Сбой задачи\n",
+        )
+        response = admin_client.get(JOB_ADMIN_URL)
+        assert response.status_code == HTTPStatus.OK
+        content = response.content.decode()
+        assert "Готовы к запуску: 1" in content
+        assert "с ошибкой: 1" in content
+
+        response = admin_client.post(JOB_ADMIN_URL, {
+            "action": "retry", "_selected_action": [failed.pk]})
+        assert response.status_code == HTTPStatus.FOUND
+        failed.refresh_from_db()
+        assert failed.status == Job.QUEUED and failed.attempts == 0
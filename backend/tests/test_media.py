@@ -0,0 +1,236 @@
+from http import HTTPStatus
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+import pytest
+
+from core.constants import RECIPE_DETAIL_URL, RECIPES_URL
+from core.models import MediaBlob
+from core.storage import is_sharded
+from recipes.models import Recipe
+
+from .test_utils import generate_base64_image
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.django_db
+class TestContentAddressedStorage:
+
+    def test_same_content_is_stored_once(
+        self, media_root, django_capture_on_commit_callbacks
+    ):
+        """Одинаковое содержимое хранится одним файлом с двумя ссылками."""
+        first = default_storage.save("recipes/images/a.png", ContentFile(b"1"))
+        second = default_storage.save(
+            "recipes/images/b.PNG", ContentFile(b"1"))
+        assert first == second, "Имя должно зависеть только от содержимого."
+        digest = first.rsplit("/", 1)[1].split(".")[0]
+        assert first == (
+            f"recipes/images/{digest[:2]}/{digest[2:4]}/{digest}.png"
+        ), f"Неверная раскладка по каталогам: {first}"
+        assert MediaBlob.objects.get(name=first).references == 2
+
+        default_storage.delete(first)
+        assert default_storage.exists(first), (
+            "Файл с оставшейся ссылкой удалять нельзя."
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            default_storage.delete(first)
+        assert not default_storage.exists(first)
+        assert not MediaBlob.objects.filter(name=first).exists()
+
+    def test_file_is_kept_or_rewritten_for_new_reference(
+        self, media_root, django_capture_on_commit_callbacks
+    ):
+        """
+        Ссылка, появившаяся до удаления файла, его сохраняет, а файл,
+        убранный очисткой, записывается заново.
+        """
+        name = default_storage.save("recipes/images/a.png", ContentFile(b"1"))
+        with django_capture_on_commit_callbacks() as callbacks:
+            default_storage.delete(name)
+        default_storage.save("recipes/images/b.png", ContentFile(b"1"))
+        for callback in callbacks:
+            callback()
+        assert default_storage.exists(name), (
+            "Файл с новой ссылкой удалять нельзя."
+        )
+        assert MediaBlob.objects.get(name=name).references == 1
+
+        os.remove(default_storage.path(name))
+        default_storage.save("recipes/images/c.png", ContentFile(b"1"))
+        assert default_storage.exists(name), "Файл должен быть записан."
+        assert MediaBlob.objects.get(name=name).references == 2
+
+    def test_deleting_recipe_releases_shared_image(
+        self, media_root, auth_client, tag, ingredient,
+        django_capture_on_commit_callbacks
+    ):
+        """Удаление рецепта снимает ссылку, а не удаляет общий файл."""
+        image = generate_base64_image(color="purple")
+        ids = []
+        for name in ("Первый", "Второй"):
+            response = auth_client.post(RECIPES_URL, {
+                "name": name,
+                "text": "Одинаковое фото.",
+                "cooking_time": 5,
+                "tags": [tag.id],
+                "ingredients": [{"id": ingredient.id, "amount": 1}],
+                "image": image,
+            }, format="json")
+            assert response.status_code == HTTPStatus.CREATED
+            ids.append(response.json()["id"])
+        first, second = Recipe.objects.filter(pk__in=ids).order_by("pk")
+        assert first.image.name == second.image.name
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_client.delete(
+                RECIPE_DETAIL_URL.format(id=first.id))
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert default_storage.exists(second.image.name), (
+            "Картинка второго рецепта должна остаться."
+        )
+        name = second.image.name
+        with django_capture_on_commit_callbacks(execute=True):
+            second.delete()
+        assert not default_storage.exists(name)
+
+
+@pytest.mark.django_db
+class TestShardMedia:
+
+    @pytest.fixture
+    def legacy_recipes(self, media_root, recipe, recipe_2):
+        """Рецепты с картинками в старой плоской раскладке."""
+        (media_root / "recipes" / "images").mkdir(parents=True)
+        for index, item in enumerate((recipe, recipe_2)):
+            name = f"recipes/images/legacy_{index}.png"
+            (media_root / name).write_bytes(f"image {index}".encode())
+            Recipe.objects.filter(pk=item.pk).update(
+                image=name, image_variants={"source": name})
+        return recipe, recipe_2
+
+    def test_shard_media_moves_files_and_is_resumable(
+        self, media_root, legacy_recipes, django_capture_on_commit_callbacks
+    ):
+        """Перенос идёт пачками, повторный запуск ничего не меняет."""
+        call_command("shard_media", "--dry-run")
+        assert not any(
+            is_sharded(recipe.image.name)
+            for recipe in Recipe.objects.all()
+        ), "--dry-run не должен ничего переносить."
+
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command("shard_media", "--batch-size", "1")
+        for index, recipe in enumerate(Recipe.objects.order_by("pk")):
+            assert is_sharded(recipe.image.name), recipe.image.name
+            assert recipe.image_variants["source"] == recipe.image.name
+            with recipe.image.open("rb") as file:
+                assert file.read() == f"image {index}".encode()
+            assert not (
+                media_root / f"recipes/images/legacy_{index}.png"
+            ).exists(), "Старый файл должен удаляться после переноса."
+
+        names = list(Recipe.objects.values_list("image", flat=True))
+        call_command("shard_media")
+        assert list(Recipe.objects.values_list("image", flat=True)) == names
+
+
+@pytest.mark.django_db
+class TestReleaseReplacedImages:
+
+    def test_replacing_recipe_image_releases_old_file(
+        self, media_root, auth_client, tag, ingredient,
+        django_capture_on_commit_callbacks
+    ):
+        """Заменённая картинка рецепта и её варианты удаляются."""
+        payload = {
+            "name": "Замена фото",
+            "text": "Фото меняется.",
+            "cooking_time": 5,
+            "tags": [tag.id],
+            "ingredients": [{"id": ingredient.id, "amount": 1}],
+            "image": generate_base64_image(color="red"),
+        }
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_client.post(RECIPES_URL, payload, format="json")
+        recipe = Recipe.objects.get(pk=response.json()["id"])
+        old_names = [recipe.image.name] + [
+            name for variant, files in recipe.image_variants.items()
+            if variant != "source" for name in files.values()
+        ]
+        assert len(old_names) > 1, "Варианты должны быть построены."
+
+        payload["image"] = generate_base64_image(color="green")
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_client.patch(
+                RECIPE_DETAIL_URL.format(id=recipe.id), payload,
+                format="json")
+        assert response.status_code == HTTPStatus.OK
+        recipe.refresh_from_db()
+        assert recipe.image.name not in old_names
+        for name in old_names:
+            assert not default_storage.exists(name), (
+                f"Старый файл {name} должен быть удалён."
+            )
+            assert not MediaBlob.objects.filter(name=name).exists()
+        assert default_storage.exists(recipe.image.name)
+        assert recipe.image_variants["source"] == recipe.image.name
+
+
+@pytest.mark.django_db
+class TestSweepMedia:
+
+    @staticmethod
+    def make_file(path, age_hours):
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(path.name.encode())
+        mtime = time.time() - age_hours * 3600
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_sweep_media_removes_only_old_orphans(
+        self, media_root, tmp_path_factory, recipe
+    ):
+        """Удаляются только старые файлы без ссылок из базы."""
+        referenced = default_storage.save(
+            "recipes/images/a.png", ContentFile(b"referenced"))
+        leaked = default_storage.save(
+            "recipes/images/b.png", ContentFile(b"leaked"))
+        Recipe.objects.filter(pk=recipe.pk).update(image=referenced)
+        for name in (referenced, leaked):
+            self.make_file(media_root / name, age_hours=48)
+        flat = self.make_file(media_root / "recipes/images/old.png", 48)
+        young = self.make_file(media_root / "users/young.png", 1)
+
+        call_command("sweep_media", "--dry-run")
+        assert (media_root / leaked).exists() and flat.exists(), (
+            "--dry-run не должен ничего удалять."
+        )
+
+        quarantine = tmp_path_factory.mktemp("quarantine")
+        call_command(
+            "sweep_media", "--quarantine", str(quarantine),
+            "--batch-size", "1", "--sleep", "0.001",
+        )
+        assert (media_root / referenced).exists()
+        assert young.exists(), "Молодые файлы защищает период ожидания."
+        assert not (media_root / leaked).exists()
+        assert not flat.exists()
+        assert (quarantine / leaked).exists()
+        assert (quarantine / "recipes/images/old.png").exists()
+        assert not MediaBlob.objects.filter(name=leaked).exists()
+        assert MediaBlob.objects.filter(name=referenced).exists()
+
+        call_command("sweep_media", "--grace-hours", "0")
+        assert not young.exists()
+        assert (media_root / referenced).exists()
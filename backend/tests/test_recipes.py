@@ -1,15 +1,29 @@
 from http import HTTPStatus
+import io
+import json
 from typing import Any, Dict, List
 
+from PIL import Image
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from logging_setup import logger_setup
 import pytest
+from rest_framework.relations import PrimaryKeyRelatedField
 
 from core.constants import (
     RECIPE_DETAIL_URL,
+    RECIPE_FAVORITE_URL,
+    RECIPE_SHOPPING_CART_URL,
     RECIPES_URL,
     UNAUTH_AND_AUTH_CLIENTS,
 )
-from recipes.models import Recipe
+from core.filters import RecipeFilter
+from core.membership import FAVORITES, SHOPPING_CART, get_membership
+from recipes.models import Favorite, Recipe, RecipeIngredient
+from users.models import Subscription
 
 from .test_utils import generate_base64_image, list_available
 
@@ -389,3 +403,604 @@ class TestRecipes:
                        after_response_json["tags"]]) == sorted(
             [t["id"] for t in before_response_json["tags"]]
         ), "Список тегов изменился!"
+
+    def test_recipes_list_flags_do_not_query_per_recipe(
+        self, auth_client, user, recipe, recipe_2, favorite, shopping_cart
+    ):
+        """
+        Флаги is_favorited и is_in_shopping_cart в списке рецептов
+        не требуют отдельного запроса на каждый рецепт.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = auth_client.get(RECIPES_URL)
+        assert response.status_code == HTTPStatus.OK, (
+            f"GET {RECIPES_URL} должен возвращать 200, "
+            f"но вернул {response.status_code}"
+        )
+        flags = {
+            item["id"]: (item["is_favorited"], item["is_in_shopping_cart"])
+            for item in response.json()["results"]
+        }
+        expected = {recipe.id: (True, True), recipe_2.id: (False, False)}
+        assert flags == expected, (
+            f"Флаги рецептов вычислены неверно: {flags}"
+        )
+        flag_queries = [
+            query["sql"] for query in context.captured_queries
+            if "EXISTS" not in query["sql"]
+            and ('"recipes_favorite"' in query["sql"]
+                 or '"recipes_shoppingcart"' in query["sql"])
+        ]
+        assert not flag_queries, (
+            "Флаги должны вычисляться аннотацией, а не отдельными "
+            f"запросами: {flag_queries}"
+        )
+
+    @pytest.mark.parametrize("fixture_name",
+                             UNAUTH_AND_AUTH_CLIENTS,
+                             indirect=True)
+    def test_recipes_list_query_count_does_not_depend_on_page_size(
+        self, fixture_name, user, user_2, tag, tag_2, ingredient, ingredient_2
+    ):
+        """Число запросов списка рецептов не растёт с размером страницы."""
+        for index in range(6):
+            recipe = Recipe.objects.create(
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=5,
+                author=(user, user_2)[index % 2],
+                image=generate_base64_image(),
+            )
+            recipe.tags.set((tag, tag_2))
+            for ing, amount in ((ingredient, 1), (ingredient_2, 2)):
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ing, amount=amount)
+
+        Subscription.objects.create(user=user, author=user_2)
+
+        query_counts = {}
+        for limit in (1, 6):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = fixture_name.get(RECIPES_URL, {"limit": limit})
+            assert len(response.json()["results"]) == limit, (
+                f"GET {RECIPES_URL}?limit={limit} должен вернуть "
+                f"{limit} рецептов."
+            )
+            query_counts[limit] = len(context.captured_queries)
+
+        is_authenticated = "HTTP_AUTHORIZATION" in fixture_name._credentials
+        for item in response.json()["results"]:
+            expected = is_authenticated and item["author"]["id"] == user_2.id
+            assert item["author"]["is_subscribed"] == expected, (
+                f"Поле is_subscribed автора должно быть {expected}."
+            )
+        assert query_counts[1] == query_counts[6], (
+            "Количество запросов не должно зависеть от размера страницы: "
+            f"{query_counts}"
+        )
+
+    def test_recipes_cursor_pagination_with_filters(
+        self, auth_client, user, user_2, tag, tag_2
+    ):
+        """
+        Курсорная пагинация обходит все отфильтрованные рецепты
+        без повторов и пропусков.
+        """
+        expected = []
+        for index in range(11):
+            recipe = Recipe.objects.create(
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=5,
+                author=user_2 if index % 4 == 3 else user,
+                image=generate_base64_image(),
+            )
+            recipe.tags.set((tag,) if index % 3 else (tag_2,))
+            if index != 2:
+                Favorite.objects.create(user=user, recipe=recipe)
+            if recipe.author == user and index % 3 and index != 2:
+                expected.append(recipe.id)
+        expected.reverse()
+
+        received = []
+        response = auth_client.get(RECIPES_URL, {
+            "pagination": "cursor",
+            "limit": 2,
+            "author": user.id,
+            "tags": tag.slug,
+            "is_favorited": 1,
+        })
+        while True:
+            assert response.status_code == HTTPStatus.OK, (
+                f"GET {RECIPES_URL} в курсорном режиме должен возвращать 200, "
+                f"но вернул {response.status_code}"
+            )
+            json_data = response.json()
+            assert "count" not in json_data, (
+                "Курсорный режим не должен считать общее количество."
+            )
+            received.extend(item["id"] for item in json_data["results"])
+            if not json_data["next"]:
+                break
+            response = auth_client.get(json_data["next"])
+        assert len(expected) == 5 and received == expected, (
+            f"Ожидались рецепты {expected}, а вернулись {received}."
+        )
+
+    def test_recipes_cached_count_invalidated_on_create_and_delete(
+        self, client, recipe, user
+    ):
+        """Закэшированное количество рецептов сбрасывается при изменениях."""
+        assert client.get(RECIPES_URL).json()["count"] == 1
+        with CaptureQueriesContext(connection) as context:
+            client.get(RECIPES_URL)
+        assert not any(
+            "COUNT(" in query["sql"] for query in context.captured_queries
+        ), "Повторный запрос списка должен брать количество из кэша."
+
+        new_recipe = Recipe.objects.create(
+            name="Новый рецепт",
+            text="Описание",
+            cooking_time=5,
+            author=user,
+            image=generate_base64_image(),
+        )
+        assert client.get(RECIPES_URL).json()["count"] == 2, (
+            "Количество должно обновиться после создания рецепта."
+        )
+        new_recipe.delete()
+        assert client.get(RECIPES_URL).json()["count"] == 1, (
+            "Количество должно обновиться после удаления рецепта."
+        )
+
+    @pytest.mark.parametrize(
+        "param", ("is_favorited", "is_in_shopping_cart"))
+    def test_anonymous_membership_filter_returns_empty_page(
+        self, client, recipe, param
+    ):
+        """Аноним с фильтром по избранному или покупкам получает пустоту."""
+        response = client.get(RECIPES_URL, {param: 1})
+        assert response.status_code == HTTPStatus.OK, (
+            f"GET {RECIPES_URL}?{param}=1 должен возвращать 200, "
+            f"но вернул {response.status_code}"
+        )
+        assert response.json()["count"] == 0
+        assert response.json()["results"] == []
+
+    def test_membership_cache_follows_favorite_and_cart_actions(
+        self, auth_client, user, recipe
+    ):
+        """
+        Кэш id избранного и списка покупок сбрасывается при добавлении
+        и удалении рецепта и собирается заново одним запросом.
+        """
+        for url, kind in (
+            (RECIPE_FAVORITE_URL, FAVORITES),
+            (RECIPE_SHOPPING_CART_URL, SHOPPING_CART),
+        ):
+            url = url.format(id=recipe.id)
+            assert recipe.id not in get_membership(user, kind)
+            auth_client.post(url)
+            assert recipe.id in get_membership(user, kind), (
+                f"После POST {url} рецепт должен быть в наборе."
+            )
+            with CaptureQueriesContext(connection) as context:
+                get_membership(user, kind)
+            assert not context.captured_queries, (
+                "Набор id должен браться из кэша без запросов к базе."
+            )
+            auth_client.delete(url)
+            assert recipe.id not in get_membership(user, kind), (
+                f"После DELETE {url} рецепта не должно быть в кэше."
+            )
+
+    def test_membership_cache_follows_admin_edits(self, user, recipe):
+        """Изменения избранного в обход API тоже сбрасывают кэш."""
+        assert recipe.id not in get_membership(user, FAVORITES)
+        favorite = Favorite.objects.create(user=user, recipe=recipe)
+        assert recipe.id in get_membership(user, FAVORITES)
+        favorite.delete()
+        assert recipe.id not in get_membership(user, FAVORITES)
+
+    def test_recipe_representation_cache_is_versioned(
+        self, client, auth_client_2, user, user_2,
+        recipe_with_ingredients_and_tags, ingredient_3
+    ):
+        """
+        Повторный запрос берёт рецепт из кэша, изменения рецепта,
+        его ингредиентов и автора сразу видны в ответе,
+        а личные флаги вычисляются для каждого пользователя.
+        """
+        recipe = recipe_with_ingredients_and_tags
+        url = RECIPE_DETAIL_URL.format(id=recipe.id)
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        assert not any(
+            '"recipes_recipeingredient"' in query["sql"]
+            for query in context.captured_queries
+        ), "Ингредиенты закэшированного рецепта не должны запрашиваться."
+
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient_3, amount=7)
+        user.first_name = "Новое имя"
+        user.save()
+        Favorite.objects.create(user=user_2, recipe=recipe)
+
+        json_data = auth_client_2.get(url).json()
+        assert ingredient_3.id in {
+            item["id"] for item in json_data["ingredients"]
+        }, "Новый ингредиент должен появиться в ответе."
+        assert json_data["author"]["first_name"] == "Новое имя", (
+            "Изменения автора должны появиться в ответе."
+        )
+        assert json_data["is_favorited"] is True, (
+            "Рецепт должен быть в избранном у второго пользователя."
+        )
+        client.credentials()
+        assert client.get(url).json()["is_favorited"] is False, (
+            "Личные флаги не должны браться из общего кэша."
+        )
+
+    def test_recipe_conditional_get_includes_user_state(
+        self, auth_client, recipe
+    ):
+        """ETag рецепта меняется при добавлении его в избранное."""
+        url = RECIPE_DETAIL_URL.format(id=recipe.id)
+        etag = auth_client.get(url).get("ETag")
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f"GET {url} с актуальным ETag должен возвращать 304, "
+            f"но вернул {response.status_code}"
+        )
+        auth_client.post(RECIPE_FAVORITE_URL.format(id=recipe.id))
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            "После добавления в избранное должен возвращаться новый ответ, "
+            f"но вернулся {response.status_code}"
+        )
+        assert response.json()["is_favorited"] is True
+
+    def test_recipes_tags_filter_choices_come_from_cache(
+        self, client, recipe_with_ingredients_and_tags, tag, tag_2
+    ):
+        """
+        Допустимые слаги тегов не вычисляются по рецептам на каждый
+        запрос, а неизвестный слаг по-прежнему отклоняется.
+        """
+        client.get(RECIPES_URL, {"tags": tag.slug})
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(RECIPES_URL, {"tags": tag.slug})
+        assert [item["id"] for item in response.json()["results"]] == [
+            recipe_with_ingredients_and_tags.id
+        ], "Фильтр по тегу должен вернуть рецепт с этим тегом."
+        assert not any(
+            "DISTINCT" in query["sql"] and '"recipes_tag"."slug"'
+            in query["sql"].split("FROM")[0]
+            for query in context.captured_queries
+        ), "Список слагов не должен запрашиваться при каждом запросе."
+
+        response = client.get(RECIPES_URL, {"tags": "unknown"})
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            "Неизвестный слаг тега должен отклоняться с 400, "
+            f"но вернулся {response.status_code}"
+        )
+
+    def test_recipes_several_tags_filter_returns_unique_recipes(
+        self, client, recipe_with_ingredients_and_tags,
+        recipe_with_ingredients_and_tags_2, tag, tag_2
+    ):
+        """
+        Фильтр по нескольким тегам возвращает каждый рецепт один раз:
+        теги проверяются подзапросом EXISTS, без JOIN и DISTINCT.
+        """
+        recipe_with_ingredients_and_tags.tags.add(tag_2)
+        response = client.get(RECIPES_URL, {"tags": [tag.slug, tag_2.slug]})
+        ids = [item["id"] for item in response.json()["results"]]
+        assert sorted(ids) == sorted({
+            recipe_with_ingredients_and_tags.id,
+            recipe_with_ingredients_and_tags_2.id,
+        }), f"Каждый рецепт должен вернуться ровно один раз: {ids}"
+        assert response.json()["count"] == 2, (
+            "Количество рецептов не должно учитывать дубли."
+        )
+
+        queryset = RecipeFilter(
+            {"tags": [tag.slug, tag_2.slug]}, queryset=Recipe.objects.all()
+        ).qs
+        assert not queryset.query.distinct
+        assert list(queryset.query.alias_map) == ["recipes_recipe"], (
+            "Теги не должны присоединяться к рецептам через JOIN."
+        )
+        plan = queryset.explain()
+        if connection.vendor == "postgresql":
+            assert "Semi Join" in plan or "SubPlan" in plan, plan
+            assert "Unique" not in plan, plan
+        elif connection.vendor == "sqlite":
+            assert "CORRELATED SCALAR SUBQUERY" in plan, plan
+            assert "DISTINCT" not in plan, plan
+
+    @staticmethod
+    def count_ingredient_writes(context):
+        writes = {"INSERT": 0, "UPDATE": 0, "DELETE": 0}
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if '"recipes_recipeingredient"' not in sql.split("WHERE")[0]:
+                continue
+            for statement in writes:
+                if sql.startswith(statement):
+                    writes[statement] += 1
+        return writes
+
+    def test_create_recipe_inserts_ingredients_at_once(
+        self, auth_client, tag, ingredient, ingredient_2, ingredient_3
+    ):
+        """Ингредиенты нового рецепта вставляются одним запросом."""
+        with CaptureQueriesContext(connection) as context:
+            response = auth_client.post(RECIPES_URL, {
+                "name": "Запеканка",
+                "text": "Смешайте и запеките.",
+                "cooking_time": 30,
+                "tags": [tag.id],
+                "ingredients": [
+                    {"id": item.id, "amount": amount}
+                    for item, amount in (
+                        (ingredient, 2), (ingredient_2, 1), (ingredient_3, 300)
+                    )
+                ],
+                "image": generate_base64_image(),
+            }, format="json")
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        writes = self.count_ingredient_writes(context)
+        assert writes == {"INSERT": 1, "UPDATE": 0, "DELETE": 0}, (
+            f"Ожидалась одна вставка ингредиентов, а выполнено {writes}"
+        )
+
+    def test_update_recipe_writes_only_ingredient_diff(
+        self, auth_client, recipe_with_ingredients_and_tags, tag,
+        ingredient, ingredient_2, ingredient_3, ingredient_4
+    ):
+        """
+        PATCH меняет только отличающиеся ингредиенты: не больше одного
+        удаления, одного обновления и одной вставки.
+        """
+        url = RECIPE_DETAIL_URL.format(id=recipe_with_ingredients_and_tags.id)
+        kept_id = RecipeIngredient.objects.get(
+            recipe=recipe_with_ingredients_and_tags, ingredient=ingredient).id
+        payload = {
+            "name": "Омлет",
+            "text": "Взбейте яйца.",
+            "cooking_time": 5,
+            "tags": [tag.id],
+            "ingredients": [
+                {"id": ingredient.id, "amount": 3},
+                {"id": ingredient_3.id, "amount": 100},
+                {"id": ingredient_4.id, "amount": 50},
+            ],
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = auth_client.patch(url, payload, format="json")
+        assert response.status_code == HTTPStatus.OK, response.json()
+        writes = self.count_ingredient_writes(context)
+        assert writes == {"INSERT": 1, "UPDATE": 1, "DELETE": 1}, (
+            f"Ожидалось по одному запросу на каждый вид изменений: {writes}"
+        )
+        amounts = dict(RecipeIngredient.objects.filter(
+            recipe=recipe_with_ingredients_and_tags
+        ).values_list("ingredient_id", "amount"))
+        assert amounts == {
+            ingredient.id: 3, ingredient_3.id: 100, ingredient_4.id: 50,
+        }, f"Неверные ингредиенты после обновления: {amounts}"
+        assert RecipeIngredient.objects.filter(pk=kept_id).exists(), (
+            "Оставшийся ингредиент не должен пересоздаваться."
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            auth_client.patch(url, payload, format="json")
+        writes = self.count_ingredient_writes(context)
+        assert writes == {"INSERT": 0, "UPDATE": 0, "DELETE": 0}, (
+            f"Повторный PATCH без изменений не должен писать: {writes}"
+        )
+
+    def test_recipe_validation_resolves_ids_in_one_query(
+        self, auth_client, tag, tag_2, ingredient, ingredient_2,
+        ingredient_3, ingredient_4
+    ):
+        """Ингредиенты и теги рецепта загружаются одним запросом на таблицу."""
+        ingredients = (ingredient, ingredient_2, ingredient_3, ingredient_4)
+        with CaptureQueriesContext(connection) as context:
+            response = auth_client.post(RECIPES_URL, {
+                "name": "Суп",
+                "text": "Сварите.",
+                "cooking_time": 40,
+                "tags": [tag.id, tag_2.id],
+                "ingredients": [
+                    {"id": item.id, "amount": 10} for item in ingredients
+                ],
+                "image": generate_base64_image(),
+            }, format="json")
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        for table in ("recipes_ingredient", "recipes_tag"):
+            lookups = [
+                query["sql"] for query in context.captured_queries
+                if query["sql"].startswith("SELECT")
+                and f'FROM "{table}" WHERE' in query["sql"]
+            ]
+            assert len(lookups) == 1, (
+                f"Id из {table} должны загружаться одним запросом: {lookups}"
+            )
+
+    def test_recipe_validation_reports_missing_ids(
+        self, auth_client, tag, ingredient
+    ):
+        """Несуществующие id дают те же ошибки, что PrimaryKeyRelatedField."""
+        message = PrimaryKeyRelatedField.default_error_messages[
+            "does_not_exist"]
+        response = auth_client.post(RECIPES_URL, {
+            "name": "Суп",
+            "text": "Сварите.",
+            "cooking_time": 40,
+            "tags": [tag.id, 1000000],
+            "ingredients": [
+                {"id": 1000001, "amount": 10},
+                {"id": ingredient.id, "amount": 10},
+            ],
+            "image": generate_base64_image(),
+        }, format="json")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {
+            "tags": [str(message).format(pk_value=1000000)],
+            "ingredients": [
+                {"id": [str(message).format(pk_value=1000001)]}, {},
+            ],
+        }, f"Неверный формат ошибок: {response.json()}"
+
+    def test_invalid_recipe_skips_image_decoding(
+        self, auth_client, ingredient
+    ):
+        """
+        Картинка декодируется только после остальных проверок:
+        при ошибке в других полях битое тело картинки не проверяется.
+        """
+        payload = {
+            "name": "Суп",
+            "text": "Сварите.",
+            "cooking_time": 0,
+            "tags": [1000000],
+            "ingredients": [{"id": ingredient.id, "amount": 10}],
+            "image": "data:image/png;base64,не-base64",
+        }
+        response = auth_client.post(RECIPES_URL, payload, format="json")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        errors = response.json()
+        assert {"tags", "cooking_time"} <= errors.keys(), errors
+        assert "image" not in errors, (
+            f"Картинка не должна проверяться раньше других полей: {errors}"
+        )
+
+    @staticmethod
+    def png_upload(name="image.png", size=(50, 50)):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, color="green").save(buffer, format="PNG")
+        return SimpleUploadedFile(
+            name, buffer.getvalue(), content_type="image/png")
+
+    def test_create_and_update_recipe_with_multipart_image(
+        self, auth_client, tag, tag_2, ingredient, ingredient_2
+    ):
+        """
+        Картинку можно передать файлом в multipart-форме: остальное —
+        частью data в JSON или отдельными полями, где JSON — только
+        теги и ингредиенты.
+        """
+        response = auth_client.post(RECIPES_URL, {
+            "data": json.dumps({
+                "name": "Оладьи",
+                "text": "Смешайте и обжарьте.",
+                "cooking_time": 20,
+                "tags": [tag.id],
+                "ingredients": [{"id": ingredient.id, "amount": 2}],
+            }),
+            "image": self.png_upload(),
+        }, format="multipart")
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        recipe = Recipe.objects.get(pk=response.json()["id"])
+        assert recipe.image.name.endswith(".png"), recipe.image.name
+
+        response = auth_client.patch(
+            RECIPE_DETAIL_URL.format(id=recipe.id),
+            {
+                "name": "[Веган] оладьи",
+                "text": "{Без яиц} смешайте и обжарьте.",
+                "cooking_time": "25",
+                "tags": json.dumps([tag_2.id]),
+                "ingredients": json.dumps(
+                    [{"id": ingredient_2.id, "amount": 1}]),
+                "image": self.png_upload(),
+            },
+            format="multipart",
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        data = response.json()
+        assert (data["name"], data["text"]) == (
+            "[Веган] оладьи", "{Без яиц} смешайте и обжарьте."
+        ), "Поля вне json_fields не должны разбираться как JSON."
+        assert [item["id"] for item in data["tags"]] == [tag_2.id]
+        assert [item["id"] for item in data["ingredients"]] == [
+            ingredient_2.id]
+        assert data["cooking_time"] == 25
+
+    def test_create_recipe_with_one_multipart_tag(
+        self, auth_client, tag, ingredient
+    ):
+        """Одно поле tags в форме — список из одного тега, а не строка."""
+        response = auth_client.post(RECIPES_URL, {
+            "name": "Оладьи",
+            "text": "Смешайте и обжарьте.",
+            "cooking_time": 20,
+            "tags": tag.id,
+            "ingredients": json.dumps([{"id": ingredient.id, "amount": 2}]),
+            "image": self.png_upload(),
+        }, format="multipart")
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        assert [item["id"] for item in response.json()["tags"]] == [tag.id]
+
+    def test_create_recipe_with_invalid_multipart_image_returns_400(
+        self, auth_client, tag, ingredient
+    ):
+        """Файл, который не является картинкой, отклоняется с 400."""
+        response = auth_client.post(RECIPES_URL, {
+            "data": json.dumps({
+                "name": "Оладьи",
+                "text": "Смешайте и обжарьте.",
+                "cooking_time": 20,
+                "tags": [tag.id],
+                "ingredients": [{"id": ingredient.id, "amount": 2}],
+            }),
+            "image": SimpleUploadedFile(
+                "image.png", b"not an image", content_type="image/png"),
+        }, format="multipart")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert "image" in response.json(), response.json()
+
+    def test_recipe_image_variants_fall_back_then_point_to_copies(
+        self, auth_client, tag, ingredient, django_capture_on_commit_callbacks
+    ):
+        """
+        До фоновой генерации адреса копий ведут на оригинал, после —
+        на уменьшенные WebP и JPEG.
+        """
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = auth_client.post(RECIPES_URL, {
+                "name": "Оладьи",
+                "text": "Смешайте и обжарьте.",
+                "cooking_time": 20,
+                "tags": [tag.id],
+                "ingredients": [{"id": ingredient.id, "amount": 2}],
+                "image": generate_base64_image(size=(2000, 1000)),
+            }, format="json")
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        data = response.json()
+        assert data["image_variants"]["thumbnail"]["webp"] == data["image"], (
+            "Пока копий нет, адрес должен вести на оригинал."
+        )
+
+        for callback in callbacks:
+            callback()
+        recipe = Recipe.objects.get(pk=data["id"])
+        url = RECIPE_DETAIL_URL.format(id=recipe.id)
+        variants = auth_client.get(url).json()["image_variants"]
+        for variant, size in settings.IMAGE_VARIANTS["recipe"].items():
+            for file_format in settings.IMAGE_VARIANT_FORMATS:
+                name = recipe.image_variants[variant][file_format]
+                assert variants[variant][file_format].endswith(name)
+                with recipe.image.storage.open(name) as file:
+                    image = Image.open(file)
+                    assert image.format == file_format.upper()
+                    assert image.width <= size[0] and image.height <= size[1]
+        short = auth_client.post(
+            RECIPE_FAVORITE_URL.format(id=recipe.id)).json()
+        assert short["image_variants"] == variants, (
+            "Краткое представление должно отдавать те же копии."
+        )
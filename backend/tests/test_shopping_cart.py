@@ -0,0 +1,246 @@
+import csv
+from http import HTTPStatus
+import io
+import json
+
+from django.core.management import CommandError, call_command
+import pytest
+
+from core.constants import (
+    RECIPE_DETAIL_URL,
+    RECIPE_DOWNLOAD_SHOPPING_CART_URL,
+    RECIPE_SHOPPING_CART_URL,
+    RECIPES_URL,
+)
+from core.deletion import soft_delete_users
+from recipes.models import (
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartTotal,
+)
+from users.models import User
+
+
+SHOPPING_CART_TOTALS_URL = f"{RECIPES_URL}shopping_cart_totals/"
+
+
+@pytest.mark.django_db
+class TestShoppingCart:
+
+    @pytest.fixture
+    def cart(self, auth_client, recipe_with_ingredients_and_tags,
+             recipe_with_ingredients_and_tags_2, ingredient):
+        RecipeIngredient.objects.create(
+            recipe=recipe_with_ingredients_and_tags_2,
+            ingredient=ingredient,
+            amount=3,
+        )
+        for recipe in (recipe_with_ingredients_and_tags,
+                       recipe_with_ingredients_and_tags_2):
+            response = auth_client.post(
+                RECIPE_SHOPPING_CART_URL.format(id=recipe.id))
+            assert response.status_code == HTTPStatus.CREATED
+        return {
+            ("Картофель", "г"): 150,
+            ("Молоко", "мл"): 40,
+            ("Соль", "г"): 5,
+            ("Яйцо", "шт"): 5,
+        }
+
+    @staticmethod
+    def download(auth_client, file_format):
+        response = auth_client.get(
+            RECIPE_DOWNLOAD_SHOPPING_CART_URL, {"file_format": file_format})
+        assert response.status_code == HTTPStatus.OK, (
+            f"GET {RECIPE_DOWNLOAD_SHOPPING_CART_URL} должен возвращать 200, "
+            f"но вернул {response.status_code}"
+        )
+        return b"".join(response.streaming_content).decode()
+
+    def test_download_shopping_cart_txt(self, auth_client, cart):
+        """Текстовый список покупок суммирует одинаковые ингредиенты."""
+        lines = self.download(auth_client, "txt").splitlines()
+        assert lines[0] == "Список покупок:"
+        assert lines[1:] == [
+            f"- {name} ({unit}) — {amount}"
+            for (name, unit), amount in cart.items()
+        ], f"Неверный список покупок: {lines}"
+
+    @pytest.mark.parametrize("file_format", ("csv", "json"))
+    def test_download_shopping_cart_csv_and_json(
+        self, auth_client, cart, file_format
+    ):
+        """Список покупок выгружается в CSV и JSON."""
+        content = self.download(auth_client, file_format)
+        if file_format == "csv":
+            rows = list(csv.DictReader(io.StringIO(content)))
+        else:
+            rows = json.loads(content)
+        received = {
+            (row["name"], row["measurement_unit"]): int(row["amount"])
+            for row in rows
+        }
+        assert received == cart, f"Неверный список покупок: {received}"
+
+    def test_download_shopping_cart_unknown_format_returns_400(
+        self, auth_client, cart
+    ):
+        """Неизвестный формат списка покупок возвращает 400."""
+        response = auth_client.get(
+            RECIPE_DOWNLOAD_SHOPPING_CART_URL, {"file_format": "pdf"})
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            "Неизвестный формат должен возвращать 400, "
+            f"но вернул {response.status_code}"
+        )
+
+    @staticmethod
+    def totals(auth_client):
+        response = auth_client.get(SHOPPING_CART_TOTALS_URL)
+        assert response.status_code == HTTPStatus.OK, (
+            f"GET {SHOPPING_CART_TOTALS_URL} должен возвращать 200, "
+            f"но вернул {response.status_code}"
+        )
+        return {
+            (row["name"], row["measurement_unit"]): row["amount"]
+            for row in response.json()
+        }
+
+    @staticmethod
+    def assert_matches_ground_truth(user):
+        call_command(
+            "rebuild_shopping_cart_totals", "--verify",
+            "--users", str(user.id), stdout=io.StringIO(),
+        )
+
+    def test_totals_follow_cart_changes(
+        self, auth_client, user, cart, recipe_with_ingredients_and_tags_2
+    ):
+        """Суммы пересчитываются при добавлении и удалении рецепта."""
+        assert self.totals(auth_client) == cart
+        auth_client.delete(RECIPE_SHOPPING_CART_URL.format(
+            id=recipe_with_ingredients_and_tags_2.id))
+        assert self.totals(auth_client) == {
+            ("Соль", "г"): 5, ("Яйцо", "шт"): 2,
+        }, "После удаления рецепта суммы должны уменьшиться"
+        self.assert_matches_ground_truth(user)
+
+    def test_totals_follow_ingredient_update(
+        self, auth_client, user, cart, recipe_with_ingredients_and_tags,
+        tag, ingredient, ingredient_4
+    ):
+        """Изменение ингредиентов рецепта в корзине меняет суммы."""
+        response = auth_client.patch(
+            RECIPE_DETAIL_URL.format(id=recipe_with_ingredients_and_tags.id),
+            {
+                "name": "Омлет с молоком",
+                "text": "Взбейте яйца с молоком.",
+                "cooking_time": 7,
+                "tags": [tag.id],
+                "ingredients": [
+                    {"id": ingredient.id, "amount": 4},
+                    {"id": ingredient_4.id, "amount": 60},
+                ],
+            },
+            format="json",
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        assert self.totals(auth_client) == {
+            ("Картофель", "г"): 150,
+            ("Молоко", "мл"): 100,
+            ("Яйцо", "шт"): 7,
+        }, "Суммы должны учитывать новые ингредиенты рецепта"
+        self.assert_matches_ground_truth(user)
+
+    def test_totals_follow_admin_edits(
+        self, auth_client, user, cart, recipe_with_ingredients_and_tags,
+        recipe_with_ingredients_and_tags_2, ingredient_4
+    ):
+        """Правки строк в обход API (админка, ORM) тоже меняют суммы."""
+        recipe = recipe_with_ingredients_and_tags
+        row = RecipeIngredient.objects.filter(recipe=recipe).first()
+        row.amount += 10
+        row.save()
+        self.assert_matches_ground_truth(user)
+        row.ingredient = ingredient_4
+        row.save()
+        self.assert_matches_ground_truth(user)
+        RecipeIngredient.objects.filter(pk=row.pk).delete()
+        self.assert_matches_ground_truth(user)
+
+        ShoppingCart.objects.filter(recipe=recipe).delete()
+        self.assert_matches_ground_truth(user)
+        cart_row = ShoppingCart.objects.get(
+            user=user, recipe=recipe_with_ingredients_and_tags_2)
+        cart_row.recipe = recipe
+        cart_row.save()
+        self.assert_matches_ground_truth(user)
+        assert set(self.totals(auth_client)) == {
+            (item.ingredient.name, item.ingredient.measurement_unit)
+            for item in recipe.recipe_ingredients.select_related("ingredient")
+        }
+
+    def test_deleted_recipe_leaves_cart_totals(
+        self, auth_client, user, cart, recipe_with_ingredients_and_tags
+    ):
+        """Удалённый рецепт вычитается из сумм."""
+        recipe_with_ingredients_and_tags.delete()
+        assert self.totals(auth_client) == {
+            ("Картофель", "г"): 150, ("Молоко", "мл"): 40, ("Яйцо", "шт"): 3,
+        }
+        self.assert_matches_ground_truth(user)
+
+    def test_deleted_recipe_is_hidden_and_purged_in_background(
+        self, auth_client, user, cart, recipe_with_ingredients_and_tags,
+        django_capture_on_commit_callbacks
+    ):
+        """Удалённый рецепт скрыт сразу, а его строки удаляются в фоне."""
+        recipe = recipe_with_ingredients_and_tags
+        url = RECIPE_DETAIL_URL.format(id=recipe.id)
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = auth_client.delete(url)
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert auth_client.get(url).status_code == HTTPStatus.NOT_FOUND
+        listed = auth_client.get(
+            RECIPES_URL, {"is_in_shopping_cart": 1}).json()["results"]
+        assert recipe.id not in [item["id"] for item in listed], (
+            "Удалённый рецепт не должен попадать в списки."
+        )
+        assert ShoppingCart.objects.filter(recipe=recipe).exists(), (
+            "Каскад не должен выполняться в запросе."
+        )
+        expected = {
+            ("Картофель", "г"): 150, ("Молоко", "мл"): 40, ("Яйцо", "шт"): 3,
+        }
+        assert self.totals(auth_client) == expected, (
+            "Скрытый рецепт должен сразу вычитаться из сумм."
+        )
+        self.assert_matches_ground_truth(user)
+
+        for callback in callbacks:
+            callback()
+        assert not Recipe.all_objects.filter(pk=recipe.pk).exists()
+        assert not ShoppingCart.objects.filter(recipe_id=recipe.pk).exists()
+        assert self.totals(auth_client) == expected, (
+            "Очистка не должна вычитать рецепт повторно."
+        )
+        self.assert_matches_ground_truth(user)
+
+    def test_deleted_author_recipes_leave_cart_totals(
+        self, auth_client, user, user_2, cart
+    ):
+        """Рецепты удалённого автора сразу вычитаются из сумм."""
+        soft_delete_users(User.objects.filter(pk=user_2.pk))
+        assert self.totals(auth_client) == {
+            ("Соль", "г"): 5, ("Яйцо", "шт"): 2,
+        }
+        self.assert_matches_ground_truth(user)
+
+    def test_rebuild_command_restores_totals(self, user, cart):
+        """Команда пересчёта восстанавливает таблицу и сверяет её."""
+        ShoppingCartTotal.objects.filter(user=user).update(amount=1)
+        with pytest.raises(CommandError):
+            call_command("rebuild_shopping_cart_totals", "--verify")
+        call_command("rebuild_shopping_cart_totals")
+        call_command("rebuild_shopping_cart_totals", "--verify")
+        self.assert_matches_ground_truth(user)
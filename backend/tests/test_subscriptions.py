@@ -1,11 +1,15 @@
 from http import HTTPStatus
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import pytest
 
 from core.constants import USER_SUBSCRIBE_URL, USER_SUBSCRIPTIONS_URL
+from recipes.models import Recipe
 from users.models import Subscription
 
-from .test_utils import list_available
+from .test_utils import generate_base64_image, list_available
 
 
 @pytest.mark.django_db(transaction=True)
@@ -82,3 +86,55 @@ class TestSubscriptions:
         assert (
             subscriptions_after == subscriptions_before - 1
         ), "Количество подписок должно уменьшиться на 1."
+
+    def test_subscriptions_recipes_limit_and_count(
+        self, auth_client, user, django_user_model
+    ):
+        """
+        В подписках возвращаются последние recipes_limit рецептов автора
+        и общее число его рецептов; число запросов не зависит от
+        количества подписок.
+        """
+        for index in range(3):
+            author = django_user_model.objects.create_user(
+                username=f"author{index}",
+                email=f"author{index}@email.com",
+                password="1234567",
+            )
+            Subscription.objects.create(user=user, author=author)
+            for number in range(index + 2):
+                Recipe.objects.create(
+                    name=f"Рецепт {number}",
+                    text="Описание",
+                    cooking_time=5,
+                    author=author,
+                    image=generate_base64_image(),
+                )
+
+        query_counts = {}
+        for limit in (1, 3):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = auth_client.get(
+                    USER_SUBSCRIPTIONS_URL,
+                    {"limit": limit, "recipes_limit": 2},
+                )
+            assert response.status_code == HTTPStatus.OK, (
+                f"GET {USER_SUBSCRIPTIONS_URL} должен возвращать 200, "
+                f"но вернул {response.status_code}"
+            )
+            query_counts[limit] = len(context.captured_queries)
+
+        for item in response.json()["results"]:
+            expected = Recipe.objects.filter(
+                author_id=item["id"]).order_by("-pub_date", "-id")
+            assert item["recipes_count"] == expected.count(), (
+                "recipes_count должен совпадать с количеством рецептов."
+            )
+            assert [recipe["id"] for recipe in item["recipes"]] == list(
+                expected.values_list("id", flat=True)[:2]
+            ), "Должны возвращаться два последних рецепта автора."
+        assert query_counts[1] == query_counts[3], (
+            "Количество запросов не должно зависеть от числа подписок: "
+            f"{query_counts}"
+        )
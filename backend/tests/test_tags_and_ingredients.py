@@ -9,6 +9,8 @@ from core.constants import (
     TAGS_URL,
     UNAUTH_AND_AUTH_CLIENTS,
 )
+from core.filters import IngredientFilter
+from recipes.models import Ingredient
 
 from .test_utils import list_available
 
@@ -93,3 +95,60 @@ class TestTagsAndIngredients:
         assert (
             json_data.get(field_name) == field_value
         ), f'Поле {field_name} {context["object_name"]} некорректно.'
+
+    @pytest.mark.parametrize("url", (TAGS_URL, INGREDIENTS_URL))
+    def test_conditional_get_returns_304_until_changed(
+        self, client, url, tag, ingredient
+    ):
+        """
+        Повторный запрос с If-None-Match возвращает 304,
+        пока данные не изменились.
+        """
+        response = client.get(url)
+        etag = response.get("ETag")
+        assert etag and response.get("Last-Modified"), (
+            f"Ответ {url} должен содержать заголовки ETag и Last-Modified."
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f"GET {url} с актуальным ETag должен возвращать 304, "
+            f"но вернул {response.status_code}"
+        )
+
+        obj = tag if url == TAGS_URL else ingredient
+        obj.name = f"{obj.name} (изменено)"
+        obj.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            f"GET {url} после изменения должен возвращать 200, "
+            f"но вернул {response.status_code}"
+        )
+
+    @pytest.mark.parametrize("value", ("о", "ко", "оль", "ф", "нет"))
+    def test_ingredient_search_matches_orm_ordering(
+        self, client, value, ingredient, ingredient_2, ingredient_3,
+        ingredient_4
+    ):
+        """
+        Поиск ингредиентов по индексу возвращает тот же порядок,
+        что и поиск через базу: сначала совпадения по началу названия,
+        одинаковые названия — по id.
+        """
+        Ingredient.objects.create(name="окорок", measurement_unit="кг")
+        Ingredient.objects.create(name="окорок", measurement_unit="г")
+        Ingredient.objects.create(name="ольха", measurement_unit="г")
+        expected = list(
+            IngredientFilter.filter_name_orm(
+                Ingredient.objects.all(), value
+            ).values_list("id", flat=True)
+        )
+        response = client.get(INGREDIENTS_URL, {"name": value})
+        received = [item["id"] for item in response.json()]
+        assert received == expected, (
+            f"Для запроса {value!r} ожидался порядок {expected}, "
+            f"а вернулся {received}."
+        )
+        response = client.get(INGREDIENTS_URL, {"name": value, "limit": 2})
+        assert [item["id"] for item in response.json()] == expected[:2], (
+            "Параметр limit должен ограничивать выдачу."
+        )
@@ -1,8 +1,11 @@
 import base64
 from http import HTTPStatus
+import io
+import os
 from typing import Any, Dict, List, Tuple
 
 from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
 import pytest
 
 from core.constants import (
@@ -15,9 +18,12 @@ from core.constants import (
     USER_PASSWORD_URL,
     USERS_URL,
 )
+from core.pagination import is_unfiltered
+from recipes.models import Recipe
 from users.models import User
+from users.views import UserViewSet
 
-from .test_utils import list_available
+from .test_utils import generate_base64_image, list_available
 
 
 INVALID_VALUES: Dict[str, List[Any]] = {
@@ -263,6 +269,69 @@ class TestUsers:
             f" но вернул {response.status_code}"
         )
 
+    @pytest.mark.parametrize(
+        "encode", (base64.b64encode, base64.encodebytes))
+    def test_add_large_avatar_decoded_by_chunks(
+        self, auth_client, user, encode
+    ):
+        """
+        Картинка больше куска декодирования сохраняется без искажений,
+        в том числе base64 с переносами строк.
+        """
+        image = Image.frombytes("RGB", (300, 300), os.urandom(300 * 300 * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        response = auth_client.put(USER_AVATAR_URL, data={
+            "avatar": "data:image/png;base64,"
+            + encode(buffer.getvalue()).decode()
+        }, format="json")
+        assert response.status_code == HTTPStatus.OK, response.json()
+        user.refresh_from_db()
+        with user.avatar.open("rb") as avatar:
+            assert avatar.read() == buffer.getvalue(), (
+                "Сохранённая картинка должна совпадать с загруженной."
+            )
+
+    def test_add_avatar_with_multipart_file(self, auth_client, user):
+        """Аватар можно загрузить файлом в multipart-форме."""
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 40), color="red").save(buffer, format="PNG")
+        response = auth_client.put(USER_AVATAR_URL, {
+            "avatar": SimpleUploadedFile(
+                "avatar.png", buffer.getvalue(), content_type="image/png"),
+        }, format="multipart")
+        assert response.status_code == HTTPStatus.OK, response.json()
+        user.refresh_from_db()
+        assert user.avatar.name.endswith(".png"), user.avatar.name
+
+    @pytest.mark.parametrize(
+        "limit, value",
+        [
+            ("IMAGE_UPLOAD_MAX_SIZE", 100),
+            ("IMAGE_UPLOAD_MAX_PIXELS", 100 * 100 - 1),
+            (None, "data:image/png;base64,iVBORw0K!!!!"),
+            (None, "data:image/png;base64,"
+                   + base64.b64encode(b"not an image").decode()),
+        ],
+    )
+    def test_add_avatar_rejects_unsafe_images(
+        self, auth_client, settings, limit, value
+    ):
+        """
+        Слишком большие, слишком «широкие» по пикселям и битые картинки
+        отклоняются с 400.
+        """
+        if limit:
+            setattr(settings, limit, value)
+            value = generate_base64_image(size=(100, 100))
+        response = auth_client.put(
+            USER_AVATAR_URL, data={"avatar": value}, format="json")
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f"PUT {USER_AVATAR_URL} должен отклонять картинку ({limit}), "
+            f"но вернул {response.status_code}"
+        )
+        assert "avatar" in response.json(), response.json()
+
     def test_change_password_successfully(self, auth_client):
         """Пользователь может успешно сменить пароль."""
         payload = {
@@ -322,3 +391,38 @@ class TestUsers:
             f"должен возвращать 204 при успешном выходе, "
             f"но вернул {response.status_code}"
         )
+
+
+@pytest.mark.django_db
+class TestDeleteUser:
+
+    def test_delete_me_hides_user_and_purges_in_background(
+        self, auth_client, client, user, recipe,
+        django_capture_on_commit_callbacks
+    ):
+        """Удалённый пользователь скрыт сразу, а строки удаляются в фоне."""
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = auth_client.delete(
+                USER_ME_URL, {"current_password": user.plaintext_password},
+                format="json")
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert auth_client.get(USER_ME_URL).status_code == (
+            HTTPStatus.UNAUTHORIZED), "Токен удалённого должен быть отозван."
+        client.credentials()
+        response = client.get(USER_DETAIL_URL.format(id=user.id))
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert not Recipe.objects.filter(author=user).exists(), (
+            "Рецепты удалённого пользователя должны скрываться."
+        )
+        assert User.objects.filter(pk=user.pk, is_active=False).exists()
+
+        for callback in callbacks:
+            callback()
+        assert not User.objects.filter(pk=user.pk).exists()
+        assert not Recipe.all_objects.filter(pk=recipe.pk).exists()
+
+    def test_users_list_keeps_estimated_count(self):
+        """Скрытие удалённых не мешает оценке количества пользователей."""
+        users = UserViewSet().get_queryset()
+        assert is_unfiltered(users)
+        assert not is_unfiltered(users.filter(is_active=True))
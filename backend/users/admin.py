@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from core.admin import SoftDeleteAdminMixin
+from core.deletion import soft_delete_users
 from users.models import Subscription, User
 
 
@@ -7,10 +9,14 @@ admin.site.empty_value_display = "Не указано"
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ("username", "first_name", "last_name", "email", "is_staff")
     search_fields = ("username", "email")
     ordering = ("username",)
+    soft_delete = staticmethod(soft_delete_users)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
 
 
 @admin.register(Subscription)
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+import core.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="avatar",
+            field=models.ImageField(
+                null=True,
+                upload_to=core.storage.ShardedUploadTo("users"),
+                verbose_name="Аватар",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_sharded_upload_to"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="deleted_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="Удалён",
+            ),
+        ),
+    ]
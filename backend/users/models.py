@@ -1,9 +1,20 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 
+from core.cache import RECIPES_VERSION, USER_VERSION, bump_version
 from core.constants import EMAIL_MAX_LENGTH, NAME_MAX_LENGTH
+from core.images import (
+    delete_variants,
+    release_replaced_image,
+    schedule_variants,
+)
 from core.managers import UserManager
+from core.membership import FOLLOWINGS, invalidate_membership
+from core.pagination import invalidate_cached_counts
+from core.storage import ShardedUploadTo
 
 
 class User(AbstractUser):
@@ -28,10 +39,23 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         "Аватар",
-        upload_to="users/",
+        upload_to=ShardedUploadTo("users"),
         blank=False,
         null=True,
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Уменьшенные копии аватара",
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Удалён",
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ()
@@ -70,3 +94,45 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f"{self.user} follows {self.author}"
+
+
+@receiver((post_save, post_delete), sender=User)
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_user_counts(sender, created=True, **kwargs):
+    if created:
+        invalidate_cached_counts(sender)
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_followings(sender, instance, **kwargs):
+    invalidate_membership(instance.user_id, FOLLOWINGS)
+
+
+@receiver(post_save, sender=User)
+def bump_user_version(sender, instance, created, update_fields=None,
+                      **kwargs):
+    if created or (
+        update_fields is not None and set(update_fields) <= {"last_login"}
+    ):
+        return
+    bump_version(USER_VERSION.format(instance.pk), RECIPES_VERSION)
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_variants(sender, instance, **kwargs):
+    schedule_variants(
+        instance, "avatar", "avatar",
+        versions=(USER_VERSION.format(instance.pk), RECIPES_VERSION),
+    )
+
+
+@receiver(pre_save, sender=User)
+def release_replaced_avatar(sender, instance, update_fields=None, **kwargs):
+    release_replaced_image(instance, "avatar", update_fields)
+
+
+@receiver(post_delete, sender=User)
+def delete_user_avatar(sender, instance, **kwargs):
+    if instance.avatar:
+        delete_variants(instance.avatar.storage, instance.image_variants)
+        instance.avatar.delete(save=False)
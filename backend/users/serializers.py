@@ -3,7 +3,8 @@ from logging_setup import logger_setup
 from rest_framework import serializers
 
 from core.exceptions import ValidationError
-from core.fields import CustomBase64ImageField
+from core.fields import CustomBase64ImageField, ImageVariantsField
+from core.membership import FOLLOWINGS, get_membership
 from users.models import Subscription
 
 
@@ -34,15 +35,31 @@ class UserCreateSerializer(BaseUserSerializer):
 class UserProfileSerializer(BaseUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.ImageField(use_url=True)
+    avatar_variants = ImageVariantsField("avatar", "avatar")
 
     class Meta(BaseUserSerializer.Meta):
-        fields = BaseUserSerializer.Meta.fields + ("is_subscribed", "avatar")
+        fields = BaseUserSerializer.Meta.fields + (
+            "is_subscribed", "avatar", "avatar_variants")
+
+    def to_representation(self, instance):
+        # Повторяющиеся на странице авторы сериализуются один раз.
+        representations = self.context.setdefault("user_representations", {})
+        key = (type(self), instance.pk)
+        if key not in representations:
+            representations[key] = super().to_representation(instance)
+        return representations[key]
 
     def get_is_subscribed(self, obj):
-        user = self.context.get("request").user
-        if user.is_anonymous:
-            return False
-        return user.followers.filter(author=obj).exists()
+        return obj.id in self._get_followed_ids()
+
+    def _get_followed_ids(self):
+        """Id авторов, на которых подписан пользователь."""
+        followed_ids = self.context.get("followed_ids")
+        if followed_ids is None:
+            followed_ids = get_membership(
+                self.context.get("request").user, FOLLOWINGS)
+            self.context["followed_ids"] = followed_ids
+        return followed_ids
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -72,6 +89,7 @@ class SubscriptionSerializer(UserProfileSerializer):
             "recipes",
             "recipes_count",
             "avatar",
+            "avatar_variants",
             "author",
         )
         extra_kwargs = {
@@ -82,17 +100,24 @@ class SubscriptionSerializer(UserProfileSerializer):
         }
 
     def to_representation(self, instance):
-        return super().to_representation(instance.author)
+        author = instance.author
+        if hasattr(instance, "recipes_count"):
+            author.recipes_count = instance.recipes_count
+        return super().to_representation(author)
 
     def get_recipes(self, obj):
         # Чтобы избежать циклического импорта
         from recipes.serializers import RecipeShortSerializer
 
-        recipes_limit = self.context.get(
-            "request").query_params.get("recipes_limit")
-        recipes = obj.recipes.all()
-        if recipes_limit is not None:
-            recipes = recipes[: int(recipes_limit)]
+        author_recipes = self.context.get("author_recipes")
+        if author_recipes is not None:
+            recipes = author_recipes.get(obj.id, [])
+        else:
+            recipes_limit = self.context.get(
+                "request").query_params.get("recipes_limit")
+            recipes = obj.recipes.all()
+            if recipes_limit is not None:
+                recipes = recipes[: int(recipes_limit)]
 
         return RecipeShortSerializer(
             recipes,
@@ -101,6 +126,9 @@ class SubscriptionSerializer(UserProfileSerializer):
         ).data
 
     def get_recipes_count(self, obj):
+        recipes_count = getattr(obj, "recipes_count", None)
+        if recipes_count is not None:
+            return recipes_count
         return obj.recipes.count()
 
     def validate(self, attrs):
@@ -1,11 +1,18 @@
+from collections import defaultdict
+
+from django.db.models import Count, Q
 from django.http import Http404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from core.deletion import soft_delete_users
 from core.mixins import CustomGetObjectMixin
+from core.parsers import MultiPartJSONParser
+from recipes.models import Recipe
 from users.models import Subscription, User
 from users.serializers import (
     AvatarSerializer,
@@ -25,7 +32,10 @@ class UserViewSet(CustomGetObjectMixin, DjoserUserViewSet):
         return super().get_permissions()
 
     def get_queryset(self):
-        return User.objects.all()
+        return User.objects.filter(deleted_at__isnull=True)
+
+    def perform_destroy(self, instance):
+        soft_delete_users(User.objects.filter(pk=instance.pk))
 
     def _handle_subscription(self, request, operation):
         user = request.user
@@ -70,14 +80,33 @@ class UserViewSet(CustomGetObjectMixin, DjoserUserViewSet):
 
     @action(detail=False, methods=("get",))
     def subscriptions(self, request):
-        user_subscriptions = Subscription.objects.filter(user=request.user)
+        user_subscriptions = (
+            Subscription.objects.filter(
+                user=request.user, author__deleted_at__isnull=True)
+            .select_related("author")
+            .annotate(recipes_count=Count(
+                "author__recipes",
+                filter=Q(author__recipes__deleted_at__isnull=True),
+            ))
+            .order_by("-id")
+        )
         pages = self.paginate_queryset(user_subscriptions)
+        recipes_limit = request.query_params.get("recipes_limit")
+        author_recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_per_author(
+            [subscription.author_id for subscription in pages],
+            limit=int(recipes_limit) if recipes_limit is not None else None,
+        ):
+            author_recipes[recipe.author_id].append(recipe)
         serializer = SubscriptionSerializer(
-            pages, many=True, context={"request": request}
+            pages,
+            many=True,
+            context={"request": request, "author_recipes": author_recipes},
         )
         return self.get_paginated_response(serializer.data)
 
-    @action(detail=False, methods=("put",), url_path="me/avatar")
+    @action(detail=False, methods=("put",), url_path="me/avatar",
+            parser_classes=(JSONParser, MultiPartJSONParser))
     def set_avatar(self, request):
         user = request.user
         serializer = AvatarSerializer(
@@ -91,7 +120,7 @@ class UserViewSet(CustomGetObjectMixin, DjoserUserViewSet):
     def delete_avatar(self, request):
         user = request.user
         if user.avatar:
-            user.avatar.delete(save=False)
+            # Файл и варианты освобождает release_replaced_avatar.
             user.avatar = None
             user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)